@@ -0,0 +1,214 @@
+"""
+Бенчмарк MapReduce-задач ЛР1 на синтетических данных (yelp_generator).
+
+Для каждого размера отдельно замеряются стадии mapper, shuffle и reducer:
+время, записей в секунду и пиковая память стадии (tracemalloc, отдельным
+прогоном, чтобы трассировка не искажала время). Дополнительно меряются
+полные запуски run_mapreduce в разных режимах. Каждый размер считается в
+отдельном процессе, так что max_rss_bytes (ru_maxrss) относится только к
+нему, а не накапливается по всем размерам. Результат — JSON, который
+удобно сравнивать между версиями.
+
+    python yelp_benchmark.py --sizes 10000 100000 1000000 --out bench.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from lab1_yelp_mapreduce import (
+    WORKERS,
+    _collect_city_stats,
+    mapper,
+    reducer,
+    run_mapreduce,
+    shuffle_and_sort,
+)
+from yelp_generator import generate
+from yelp_query import key_categories
+
+
+def category_mapper(line):
+    """Mapper категорийной задачи ЛР3: (category) -> (stars, 1)."""
+    try:
+        obj = json.loads(line)
+    except json.JSONDecodeError:
+        return []
+
+    try:
+        stars = float(obj.get("stars"))
+    except (TypeError, ValueError):
+        return []
+
+    return [(cat, (stars, 1)) for cat in key_categories(obj)]
+
+
+JOBS = {
+    "city": mapper,
+    "category": category_mapper,
+}
+
+
+def _map_stage(path, job_mapper):
+    mapped = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            mapped.extend(job_mapper(line))
+    return mapped
+
+
+def _run_stages(path, job_mapper):
+    """Прогоняет стадии по очереди, возвращает (время стадий, размеры)."""
+    timings = {}
+
+    t0 = time.perf_counter()
+    mapped = _map_stage(path, job_mapper)
+    timings["mapper"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    grouped = shuffle_and_sort(mapped)
+    timings["shuffle"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    _collect_city_stats(grouped.items(), reducer)
+    timings["reducer"] = time.perf_counter() - t0
+
+    return timings, len(mapped), len(grouped)
+
+
+def _stage_peaks(path, job_mapper):
+    """Пиковая память каждой стадии в байтах (tracemalloc)."""
+    peaks = {}
+    tracemalloc.start()
+
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    mapped = _map_stage(path, job_mapper)
+    peaks["mapper"] = tracemalloc.get_traced_memory()[1] - base
+
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    grouped = shuffle_and_sort(mapped)
+    peaks["shuffle"] = tracemalloc.get_traced_memory()[1] - base
+
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    _collect_city_stats(grouped.items(), reducer)
+    peaks["reducer"] = tracemalloc.get_traced_memory()[1] - base
+
+    tracemalloc.stop()
+    return peaks
+
+
+def _max_rss_bytes():
+    """Пик RSS текущего процесса (без его воркеров) за всё время его жизни."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт килобайты, macOS — байты
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _git_revision():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_size(path, rows, workers=WORKERS):
+    result = {"rows": rows, "bytes": os.path.getsize(path), "jobs": {}, "runs": {}}
+
+    for name, job_mapper in JOBS.items():
+        timings, n_mapped, n_groups = _run_stages(path, job_mapper)
+        peaks = _stage_peaks(path, job_mapper)
+
+        stages = {}
+        for stage, seconds in timings.items():
+            records = rows if stage == "mapper" else n_mapped
+            stages[stage] = {
+                "wall_s": seconds,
+                "records_per_s": records / seconds if seconds > 0 else None,
+                "peak_traced_bytes": peaks[stage],
+            }
+        result["jobs"][name] = {
+            "mapped_records": n_mapped,
+            "groups": n_groups,
+            "stages": stages,
+        }
+
+    modes = {
+        "materialize": dict(use_cache=False),
+        "streaming": dict(use_cache=False, streaming=True),
+        "parallel": dict(use_cache=False, workers=workers),
+    }
+    for mode, kwargs in modes.items():
+        t0 = time.perf_counter()
+        run_mapreduce(path, **kwargs)
+        seconds = time.perf_counter() - t0
+        result["runs"][mode] = {"wall_s": seconds, "records_per_s": rows / seconds}
+
+    result["max_rss_bytes"] = _max_rss_bytes()
+    return result
+
+
+def bench_size_isolated(path, rows, workers=WORKERS):
+    """bench_size в свежем процессе (spawn): ru_maxrss меряется с нуля."""
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+        return pool.submit(bench_size, path, rows, workers).result()
+
+
+def run_benchmark(sizes, workers=WORKERS, seed=0, malformed_rate=0.001):
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "workers": workers,
+        "results": [],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            path = os.path.join(tmp, f"business_{rows}.json")
+            generate(path, rows, malformed_rate=malformed_rate, seed=seed)
+            report["results"].append(bench_size_isolated(path, rows, workers))
+            os.remove(path)
+
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Бенчмарк MapReduce-задач ЛР1")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    ap.add_argument("--workers", type=int, default=WORKERS)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=None, help="куда записать JSON (по умолчанию stdout)")
+    args = ap.parse_args()
+
+    report = run_benchmark(args.sizes, workers=args.workers, seed=args.seed)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"Результаты сохранены в {args.out}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
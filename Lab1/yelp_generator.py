@@ -0,0 +1,110 @@
+"""
+Генератор синтетического датасета в формате yelp_academic_dataset_business.json
+(JSON-lines), чтобы гонять MapReduce-задачи на любых объёмах без реальных данных.
+
+Города и категории выбираются по закону Ципфа (несколько крупных городов и
+популярных категорий и длинный хвост), часть строк намеренно портится.
+
+    python yelp_generator.py out.json --rows 1000000 --malformed-rate 0.001
+"""
+import argparse
+import json
+import random
+import string
+from itertools import accumulate
+
+STATES = ["AZ", "CA", "FL", "IN", "LA", "MO", "NJ", "NV", "PA", "TN"]
+
+BASE_CATEGORIES = [
+    "Restaurants", "Food", "Shopping", "Home Services", "Beauty & Spas",
+    "Nightlife", "Health & Medical", "Local Services", "Bars", "Automotive",
+    "Event Planning & Services", "Sandwiches", "American (Traditional)",
+    "Active Life", "Pizza", "Coffee & Tea", "Fast Food", "Breakfast & Brunch",
+    "American (New)", "Hotels & Travel", "Home & Garden", "Fashion",
+    "Burgers", "Arts & Entertainment", "Auto Repair", "Hair Salons",
+    "Nail Salons", "Mexican", "Italian", "Specialty Food",
+]
+
+
+def zipf_cum_weights(n, s):
+    return list(accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def make_names(prefix, base, n):
+    names = list(base[:n])
+    names.extend(f"{prefix} {i}" for i in range(len(names), n))
+    return names
+
+
+def generate_business(rng, cities, city_weights, categories, category_weights, max_categories):
+    city_idx = rng.choices(range(len(cities)), cum_weights=city_weights)[0]
+
+    n_cat = rng.randint(1, min(max_categories, len(categories)))
+    cats = []
+    while len(cats) < n_cat:
+        cat = rng.choices(categories, cum_weights=category_weights)[0]
+        if cat not in cats:
+            cats.append(cat)
+
+    return {
+        "business_id": "".join(rng.choices(string.ascii_letters + string.digits + "-_", k=22)),
+        "name": f"Business {rng.randrange(10 ** 6)}",
+        "address": f"{rng.randint(1, 9999)} Main St",
+        "city": cities[city_idx],
+        "state": STATES[city_idx % len(STATES)],
+        "postal_code": f"{rng.randint(10000, 99999)}",
+        "latitude": round(rng.uniform(25.0, 50.0), 6),
+        "longitude": round(rng.uniform(-125.0, -70.0), 6),
+        "stars": rng.randint(2, 10) / 2,
+        "review_count": int(rng.lognormvariate(3.0, 1.2)) + 5,
+        "is_open": rng.randint(0, 1),
+        "attributes": None,
+        "categories": ", ".join(cats),
+        "hours": None,
+    }
+
+
+def generate(path, rows, n_cities=1000, n_categories=1300, zipf_s=1.1,
+             malformed_rate=0.001, max_categories=5, seed=0):
+    """
+    Пишет rows строк в path. malformed_rate — доля обрезанных (невалидных)
+    JSON-строк, которые mapper должен пропускать.
+    """
+    rng = random.Random(seed)
+
+    cities = make_names("City", [], n_cities)
+    city_weights = zipf_cum_weights(n_cities, zipf_s)
+    categories = make_names("Category", BASE_CATEGORIES, n_categories)
+    category_weights = zipf_cum_weights(n_categories, zipf_s)
+
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(rows):
+            business = generate_business(
+                rng, cities, city_weights, categories, category_weights, max_categories
+            )
+            line = json.dumps(business, ensure_ascii=False)
+            if rng.random() < malformed_rate:
+                line = line[:rng.randrange(1, len(line))]
+            f.write(line + "\n")
+
+    return path
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Синтетический Yelp business JSON-lines")
+    ap.add_argument("path")
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--cities", type=int, default=1000)
+    ap.add_argument("--categories", type=int, default=1300)
+    ap.add_argument("--zipf-s", type=float, default=1.1)
+    ap.add_argument("--malformed-rate", type=float, default=0.001)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    generate(args.path, args.rows, n_cities=args.cities, n_categories=args.categories,
+             zipf_s=args.zipf_s, malformed_rate=args.malformed_rate, seed=args.seed)
+    print(f"Сгенерировано {args.rows} строк в {args.path}")
+
+
+if __name__ == "__main__":
+    main()
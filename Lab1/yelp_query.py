@@ -0,0 +1,295 @@
+"""
+Однопроходный слой запросов поверх MapReduce из lab1_yelp_mapreduce:
+несколько group-by с агрегатами считаются за одно чтение файла.
+
+    queries = QuerySet([
+        GroupBy("best_city", key_city, [Avg("stars")], having=10, order_by="avg_stars", top_k=10),
+        GroupBy("rating_dist", key_stars, [Count()], order_by="key", descending=False),
+    ])
+    results = queries.run("yelp_academic_dataset_business.json")
+
+mapper разбирает JSON-строку один раз и выдаёт пары ((query, key), state)
+для каждого зарегистрированного group-by; combiner сливает состояния,
+reducer считает итоговые агрегаты, HAVING и top-K.
+"""
+import heapq
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+from lab1_yelp_mapreduce import (
+    BUSINESS_PATH,
+    MIN_BUSINESSES_PER_CITY,
+    SPLITS_PER_WORKER,
+    WORKERS,
+    combine_into,
+    map_split,
+    merge_partials,
+    split_file,
+)
+
+
+def _number(value):
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# =========================
+#  Ключи группировки
+# =========================
+
+def key_city(obj):
+    city = obj.get("city")
+    return [str(city).strip()] if city else []
+
+
+def key_state(obj):
+    state = obj.get("state")
+    return [str(state).strip()] if state else []
+
+
+def key_categories(obj):
+    """categories — строка вида "Restaurants, Pizza, Italian", разворачиваем её."""
+    categories = obj.get("categories")
+    if not categories:
+        return []
+    return [cat.strip() for cat in str(categories).split(",") if cat.strip()]
+
+
+def key_stars(obj):
+    """Корзина по рейтингу: рейтинги в Yelp кратны 0.5."""
+    stars = _number(obj.get("stars"))
+    return [] if stars is None else [stars]
+
+
+# =========================
+#  Агрегаты
+# =========================
+
+class Aggregate:
+    """
+    Базовый агрегат: extract достаёт значение поля из строки (None — строка
+    пропускается), init строит состояние из одного значения, merge сливает
+    два состояния (может менять левое на месте), result — итог.
+    """
+    field = None
+    name = None
+
+    def extract(self, obj):
+        return _number(obj.get(self.field))
+
+    def init(self, value):
+        return value
+
+    def merge(self, a, b):
+        raise NotImplementedError
+
+    def result(self, state):
+        return state
+
+
+class Count(Aggregate):
+    name = "count"
+
+    def extract(self, obj):
+        return 1
+
+    def init(self, value):
+        return 1
+
+    def merge(self, a, b):
+        return a + b
+
+
+class Sum(Aggregate):
+    def __init__(self, field):
+        self.field = field
+        self.name = f"sum_{field}"
+
+    def merge(self, a, b):
+        return a + b
+
+
+class Avg(Aggregate):
+    def __init__(self, field):
+        self.field = field
+        self.name = f"avg_{field}"
+
+    def init(self, value):
+        return value, 1
+
+    def merge(self, a, b):
+        return a[0] + b[0], a[1] + b[1]
+
+    def result(self, state):
+        total, n = state
+        return total / n if n else None
+
+
+class Min(Aggregate):
+    def __init__(self, field):
+        self.field = field
+        self.name = f"min_{field}"
+
+    def merge(self, a, b):
+        return a if a <= b else b
+
+
+class Max(Aggregate):
+    def __init__(self, field):
+        self.field = field
+        self.name = f"max_{field}"
+
+    def merge(self, a, b):
+        return a if a >= b else b
+
+
+class GroupBy:
+    """
+    Один запрос: key(obj) -> список ключей (может быть несколько, как у
+    категорий), aggregates — агрегаты по числовым полям.
+    Строка учитывается, только если все поля агрегатов (и require) валидны.
+    having — минимальное число строк в группе (HAVING COUNT(*) >= N),
+    order_by — имя агрегата или "key", top_k — сколько групп оставить.
+    """
+
+    def __init__(self, name, key, aggregates, having=None, order_by=None,
+                 descending=True, top_k=None, require=()):
+        self.name = name
+        self.key = key
+        self.aggregates = list(aggregates)
+        self.having = having
+        self.order_by = order_by
+        self.descending = descending
+        self.top_k = top_k
+        self.require = tuple(require)
+
+    def extract(self, obj):
+        """Значения полей агрегатов или None, если строку нужно пропустить."""
+        if any(_number(obj.get(field)) is None for field in self.require):
+            return None
+        values = tuple(agg.extract(obj) for agg in self.aggregates)
+        if any(value is None for value in values):
+            return None
+        return values
+
+    def init(self, values):
+        # нулевой элемент — всегда число строк, нужен для having
+        return (1,) + tuple(agg.init(value) for agg, value in zip(self.aggregates, values))
+
+    def merge(self, a, b):
+        return (a[0] + b[0],) + tuple(
+            agg.merge(x, y) for agg, x, y in zip(self.aggregates, a[1:], b[1:])
+        )
+
+    def finalize(self, groups):
+        rows = []
+        for key, state in groups:
+            if self.having is not None and state[0] < self.having:
+                continue
+            row = {"key": key, "count": state[0]}
+            for agg, agg_state in zip(self.aggregates, state[1:]):
+                row[agg.name] = agg.result(agg_state)
+            rows.append(row)
+
+        if self.order_by is None:
+            return rows[:self.top_k] if self.top_k is not None else rows
+
+        sort_key = lambda row: row[self.order_by]
+        if self.top_k is not None:
+            pick = heapq.nlargest if self.descending else heapq.nsmallest
+            return pick(self.top_k, rows, key=sort_key)
+        return sorted(rows, key=sort_key, reverse=self.descending)
+
+
+class QuerySet:
+    def __init__(self, queries):
+        self.queries = list(queries)
+        names = [q.name for q in self.queries]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Имена запросов должны быть уникальны: {names}")
+        self._by_name = {q.name: q for q in self.queries}
+
+    def mapper(self, line):
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError:
+            return []
+
+        out = []
+        for q in self.queries:
+            values = q.extract(obj)
+            if values is None:
+                continue
+            # состояние создаётся на каждый ключ: merge может менять его на месте
+            for key in q.key(obj):
+                out.append(((q.name, key), (q.name, q.init(values))))
+        return out
+
+    def combiner(self, a, b):
+        # значения несут имя запроса: combiner не видит ключ, а merge у каждого свой
+        name = a[0]
+        return name, self._by_name[name].merge(a[1], b[1])
+
+    def reducer(self, state):
+        grouped = {q.name: [] for q in self.queries}
+        for (name, key), (_, value) in state.items():
+            grouped[name].append((key, value))
+        return {q.name: q.finalize(grouped[q.name]) for q in self.queries}
+
+    def run(self, path, workers=1):
+        """
+        Все запросы за один проход по файлу. workers > 1 — по сплитам
+        в пуле процессов, как run_mapreduce_parallel.
+        """
+        if workers <= 1:
+            state = {}
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    combine_into(state, self.mapper(line), self.combiner)
+            return self.reducer(state)
+
+        splits = split_file(path, workers * SPLITS_PER_WORKER)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(map_split, path, start, end, self.mapper, self.combiner)
+                       for start, end in splits]
+            partials = [fut.result() for fut in futures]
+
+        return self.reducer(merge_partials(partials, self.combiner))
+
+
+def dashboard_queries(min_city=MIN_BUSINESSES_PER_CITY, min_category=20, top_k=20):
+    """
+    Три вопроса ЛР1/ЛР3 одним проходом: лучший город, лучшие категории
+    (n_business >= 20) и распределение заведений по рейтингу.
+    """
+    return QuerySet([
+        GroupBy("city", key_city, [Avg("stars")], having=min_city,
+                order_by="avg_stars", top_k=top_k),
+        GroupBy("category", key_categories, [Avg("stars")], having=min_category,
+                order_by="avg_stars", top_k=top_k),
+        GroupBy("rating_dist", key_stars, [Count()], order_by="key", descending=False),
+    ])
+
+
+def main():
+    results = dashboard_queries().run(BUSINESS_PATH, workers=WORKERS)
+
+    print("Топ городов по среднему рейтингу:")
+    for row in results["city"][:10]:
+        print(f"  {row['key']:25s} | средний рейтинг = {row['avg_stars']:.3f} | заведений = {row['count']}")
+
+    print("\nТоп категорий по среднему рейтингу (n_business >= 20):")
+    for row in results["category"]:
+        print(f"  {row['key']:35s} | средний рейтинг = {row['avg_stars']:.3f} | заведений = {row['count']}")
+
+    print("\nРаспределение бизнесов по среднему рейтингу:")
+    for row in results["rating_dist"]:
+        print(f"  {row['key']:.1f}: {row['count']}")
+
+
+if __name__ == "__main__":
+    main()
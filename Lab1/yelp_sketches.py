@@ -0,0 +1,261 @@
+"""
+Сливаемые скетчи с фиксированной памятью на ключ:
+- KLLSketch — квантили (медиана, p90) по потоку чисел;
+- HyperLogLog — приближённое число различных значений.
+
+Оба скетча поддерживают merge, поэтому годятся как состояния комбайнера
+и reducer'а и в последовательном, и в параллельном (по сплитам) запуске.
+Агрегаты Quantile/Median/DistinctCount подключаются к GroupBy из yelp_query.
+
+Погрешности:
+- KLL с k=200: ошибка по рангу около 1.3% (для одного квантиля,
+  с вероятностью 99%), память не больше ~3k значений на ключ;
+- HLL с p=12 (4096 регистров по байту): стандартная относительная
+  ошибка 1.04 / sqrt(4096) ~ 1.6%, память 4 КБ на ключ.
+"""
+import hashlib
+import math
+import random
+
+from lab1_yelp_mapreduce import BUSINESS_PATH, WORKERS
+from yelp_query import Aggregate, GroupBy, QuerySet, key_categories, key_city
+
+KLL_K = 200
+
+KLL_C = 2.0 / 3.0
+
+HLL_P = 12
+
+
+class KLLSketch:
+    """
+    Квантильный скетч Karnin-Lang-Liberty: иерархия компакторов, элемент
+    на уровне h имеет вес 2**h. Переполненный компактор сортируется, и в
+    следующий уровень уходит каждый второй элемент со случайным сдвигом.
+    """
+
+    __slots__ = ("k", "compactors", "size", "max_size")
+
+    def __init__(self, k=KLL_K):
+        self.k = k
+        self.compactors = [[]]
+        self.size = 0
+        self.max_size = self._capacity(0)
+
+    def _capacity(self, h):
+        depth = len(self.compactors) - h - 1
+        return int(math.ceil(KLL_C ** depth * self.k)) + 1
+
+    def _grow(self):
+        self.compactors.append([])
+        self.max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def _compress(self):
+        for h in range(len(self.compactors)):
+            level = self.compactors[h]
+            if len(level) < self._capacity(h):
+                continue
+            if h + 1 >= len(self.compactors):
+                self._grow()
+
+            level.sort()
+            keep = level.pop() if len(level) % 2 else None
+            offset = random.getrandbits(1)
+            self.compactors[h + 1].extend(level[offset::2])
+            level.clear()
+            if keep is not None:
+                level.append(keep)
+
+            self.size = sum(len(c) for c in self.compactors)
+            if self.size < self.max_size:
+                break
+
+    def add(self, value):
+        self.compactors[0].append(value)
+        self.size += 1
+        if self.size >= self.max_size:
+            self._compress()
+
+    def merge(self, other):
+        """Вливает other в self (self меняется на месте) и возвращает self."""
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for h, level in enumerate(other.compactors):
+            self.compactors[h].extend(level)
+        self.size = sum(len(c) for c in self.compactors)
+        while self.size >= self.max_size:
+            self._compress()
+        return self
+
+    def quantile(self, q):
+        items = sorted(
+            (value, 1 << h) for h, level in enumerate(self.compactors) for value in level
+        )
+        if not items:
+            return None
+
+        total = sum(weight for _, weight in items)
+        target = q * total
+        cumulative = 0
+        for value, weight in items:
+            cumulative += weight
+            if cumulative >= target:
+                return value
+        return items[-1][0]
+
+
+def _hash64(value):
+    # встроенный hash() рандомизирован по процессам, а скетчи из разных
+    # процессов должны сливаться — берём стабильный хеш
+    digest = hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class HyperLogLog:
+    """
+    HyperLogLog с 2**p регистрами. Пока заполнено мало регистров, они
+    хранятся разреженно (dict), что важно для состояний из одной строки.
+    """
+
+    __slots__ = ("p", "sparse", "registers")
+
+    def __init__(self, p=HLL_P):
+        self.p = p
+        self.sparse = {}
+        self.registers = None
+
+    def _set(self, idx, rho):
+        if self.registers is not None:
+            if rho > self.registers[idx]:
+                self.registers[idx] = rho
+            return
+
+        if rho > self.sparse.get(idx, 0):
+            self.sparse[idx] = rho
+            if len(self.sparse) > (1 << self.p) // 8:
+                self.registers = bytearray(1 << self.p)
+                for i, r in self.sparse.items():
+                    self.registers[i] = r
+                self.sparse = {}
+
+    def add(self, value):
+        x = _hash64(value)
+        idx = x >> (64 - self.p)
+        rest = x & ((1 << (64 - self.p)) - 1)
+        rho = (64 - self.p) - rest.bit_length() + 1
+        self._set(idx, rho)
+
+    def merge(self, other):
+        """Вливает other в self (self меняется на месте) и возвращает self."""
+        if other.registers is not None:
+            if self.registers is None:
+                sparse = self.sparse
+                self.registers = bytearray(other.registers)
+                self.sparse = {}
+                for idx, rho in sparse.items():
+                    self._set(idx, rho)
+            else:
+                self.registers = bytearray(map(max, self.registers, other.registers))
+        else:
+            for idx, rho in other.sparse.items():
+                self._set(idx, rho)
+        return self
+
+    def count(self):
+        m = 1 << self.p
+        if self.registers is None:
+            zeros = m - len(self.sparse)
+            harmonic = zeros + sum(2.0 ** -rho for rho in self.sparse.values())
+        else:
+            zeros = self.registers.count(0)
+            harmonic = sum(2.0 ** -rho for rho in self.registers)
+
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / harmonic
+
+        # поправка для малых кардинальностей (linear counting)
+        if estimate <= 2.5 * m and zeros > 0:
+            estimate = m * math.log(m / zeros)
+
+        return int(round(estimate))
+
+
+# =========================
+#  Агрегаты для yelp_query
+# =========================
+
+class Quantile(Aggregate):
+    def __init__(self, field, q, k=KLL_K, name=None):
+        self.field = field
+        self.q = q
+        self.k = k
+        self.name = name or f"p{int(round(q * 100))}_{field}"
+
+    def init(self, value):
+        sketch = KLLSketch(self.k)
+        sketch.add(value)
+        return sketch
+
+    def merge(self, a, b):
+        return a.merge(b)
+
+    def result(self, state):
+        return state.quantile(self.q)
+
+
+class Median(Quantile):
+    def __init__(self, field, k=KLL_K):
+        super().__init__(field, 0.5, k, name=f"median_{field}")
+
+
+class DistinctCount(Aggregate):
+    def __init__(self, field, p=HLL_P):
+        self.field = field
+        self.p = p
+        self.name = f"distinct_{field}"
+
+    def extract(self, obj):
+        return obj.get(self.field)
+
+    def init(self, value):
+        sketch = HyperLogLog(self.p)
+        sketch.add(value)
+        return sketch
+
+    def merge(self, a, b):
+        return a.merge(b)
+
+    def result(self, state):
+        return state.count()
+
+
+def sketch_queries(top_k=20):
+    """
+    Медиана рейтинга, p90 числа отзывов и число различных business_id
+    по городам и по категориям.
+    """
+    aggregates = lambda: [
+        Median("stars"),
+        Quantile("review_count", 0.9),
+        DistinctCount("business_id"),
+    ]
+    return QuerySet([
+        GroupBy("city", key_city, aggregates(), order_by="count", top_k=top_k),
+        GroupBy("category", key_categories, aggregates(), order_by="count", top_k=top_k),
+    ])
+
+
+def main():
+    results = sketch_queries().run(BUSINESS_PATH, workers=WORKERS)
+
+    for name, title in (("city", "Города"), ("category", "Категории")):
+        print(f"{title} (по числу заведений):")
+        for row in results[name]:
+            print(f"  {row['key']:35s} | медиана рейтинга = {row['median_stars']:.1f}"
+                  f" | p90 отзывов = {row['p90_review_count']:.0f}"
+                  f" | различных заведений ~ {row['distinct_business_id']}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,40 +3,107 @@
 3. Продемонстрировать их работу
 """
 
-from collections import defaultdict
-import numpy as np
+import multiprocessing
+import os
+import sys
+import time
+from collections import namedtuple
+from functools import partial
+from itertools import repeat
 
+import numpy as np
 
-def run_map_reduce(inputs, mapper, reducer):
-    intermediate = defaultdict(list)
-    for record in inputs:
-        for key, value in mapper(record):
-            intermediate[key].append(value)
+try:
+    import mapreduce_engine
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import mapreduce_engine
+
+
+def run_map_reduce(inputs, mapper, reducer, combiner=None, executor="serial", workers=None,
+                   counters=None, spill_threshold=None):
+    """
+    Запуск задачи на общем движке mapreduce_engine.
+    executor: "serial", "thread" или "process".
+    spill_threshold — бюджет памяти в промежуточных записях на map-задачу:
+    сверх него shuffle сбрасывает отсортированные прогоны на диск, а выход
+    возвращается итерируемым SpilledOutput (число сбросов и байт — в counters).
+    """
+    return mapreduce_engine.run(
+        inputs, mapper, reducer,
+        combiner=combiner,
+        executor=executor,
+        workers=workers,
+        counters=counters,
+        spill_threshold=spill_threshold,
+    )
+
+
+# =========================
+#  Разреженные матрицы (COO / CSR)
+# =========================
+
+COOMatrix = namedtuple("COOMatrix", ["rows", "cols", "data", "shape"])
+CSRMatrix = namedtuple("CSRMatrix", ["indptr", "indices", "data", "shape"])
+
+
+def to_coo(M):
+    """
+    Приводит матрицу к COO без циклов Python: плотный numpy-массив (через
+    nonzero), COOMatrix, CSRMatrix или scipy.sparse (если установлен).
+    Поля COOMatrix приводятся к numpy-массивам (их можно задать списками).
+    """
+    if isinstance(M, COOMatrix):
+        return COOMatrix(np.asarray(M.rows, dtype=np.int64), np.asarray(M.cols, dtype=np.int64),
+                         np.asarray(M.data), tuple(M.shape))
+
+    if isinstance(M, CSRMatrix):
+        counts = np.diff(M.indptr)
+        rows = np.repeat(np.arange(len(counts)), counts)
+        return COOMatrix(rows, np.asarray(M.indices), np.asarray(M.data), M.shape)
+
+    if hasattr(M, "tocoo"):
+        coo = M.tocoo()
+        return COOMatrix(coo.row, coo.col, coo.data, coo.shape)
+
+    M = np.asarray(M)
+    rows, cols = np.nonzero(M)
+    return COOMatrix(rows, cols, M[rows, cols], M.shape)
+
+
+def coo_to_records(tag, coo):
+    return list(zip(repeat(tag), coo.rows.tolist(), coo.cols.tolist(), coo.data.tolist()))
+
+
+def coo_to_dense(coo):
+    """Повторяющиеся координаты складываются, как принято в COO."""
+    coo = to_coo(coo)
+    C = np.zeros(coo.shape, dtype=float)
+    np.add.at(C, (coo.rows, coo.cols), coo.data)
+    return C
 
-    outputs = []
-    for key, values in intermediate.items():
-        for out in reducer(key, values):
-            outputs.append(out)
 
-    return outputs
+def coo_to_csr(coo):
+    order = np.lexsort((coo.cols, coo.rows))
+    rows = coo.rows[order]
+    indptr = np.zeros(coo.shape[0] + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=coo.shape[0]), out=indptr[1:])
+    return CSRMatrix(indptr, coo.cols[order], coo.data[order], coo.shape)
 
 
 def matrix_to_records(A, B):
+    """
+    Записи ("A", i, k, a_ik) и ("B", k, j, b_kj) только для ненулевых
+    элементов. A и B — плотные или разреженные (см. to_coo).
+    """
+    A = to_coo(A)
+    B = to_coo(B)
+
     m, n = A.shape
     n2, p = B.shape
     assert n == n2
 
-    records = []
-
-    for i in range(m):
-        for k in range(n):
-            if A[i, k] != 0:
-                records.append(("A", i, k, A[i, k]))
-
-    for k in range(n):
-        for j in range(p):
-            if B[k, j] != 0:
-                records.append(("B", k, j, B[k, j]))
+    records = coo_to_records("A", A) + coo_to_records("B", B)
 
     return records, m, p
 
@@ -83,20 +150,361 @@ def reducer_mm_job2(key, values):
     yield (key, total)
 
 
-def multiply_matrices_mapreduce(A, B):
+def combiner_mm_job2(key, values):
+    # частичная сумма по (i, j) внутри одной map-задачи
+    yield sum(values)
+
+
+def multiply_matrices_mapreduce(A, B, executor="serial", workers=None, spill_threshold=None,
+                                counters=None, use_combiner=False):
+    """
+    Плотный результат multiply_sparse_mapreduce (вход — любой, см. to_coo).
+    use_combiner=True — частичные произведения суммируются по (i, j) ещё
+    на стороне map во второй задаче, и в shuffle уходит меньше записей.
+    """
+    C = multiply_sparse_mapreduce(A, B, executor=executor, workers=workers,
+                                  spill_threshold=spill_threshold, counters=counters,
+                                  use_combiner=use_combiner)
+    return coo_to_dense(C)
+
+
+def multiply_sparse_mapreduce(A, B, executor="serial", workers=None, spill_threshold=None,
+                              counters=None, use_combiner=False):
+    """
+    Умножение из двух задач: вход — разреженные матрицы (COOMatrix,
+    CSRMatrix, scipy.sparse или плотные), результат — COOMatrix без
+    плотного np.zeros((m, p)): работа и память пропорциональны числу
+    ненулевых элементов и частичных произведений. В counters (если задан)
+    попадают счётчики задач "job1" и "job2".
+    """
     records, m, p = matrix_to_records(A, B)
 
-    job1_output = run_map_reduce(records, mapper_mm_job1, reducer_mm_job1)
+    job1_counters = {}
+    job1_output = run_map_reduce(records, mapper_mm_job1, reducer_mm_job1,
+                                 executor=executor, workers=workers,
+                                 counters=job1_counters, spill_threshold=spill_threshold)
+
+    job2_counters = {}
+    job2_output = run_map_reduce(job1_output, mapper_mm_job2, reducer_mm_job2,
+                                 combiner=combiner_mm_job2 if use_combiner else None,
+                                 executor=executor, workers=workers,
+                                 counters=job2_counters, spill_threshold=spill_threshold)
+
+    if counters is not None:
+        counters["job1"] = job1_counters
+        counters["job2"] = job2_counters
+
+    entries = [(i, j, value) for (i, j), value in job2_output if value != 0]
+    rows = np.fromiter((i for i, _, _ in entries), dtype=np.int64, count=len(entries))
+    cols = np.fromiter((j for _, j, _ in entries), dtype=np.int64, count=len(entries))
+    data = np.fromiter((v for _, _, v in entries), dtype=float, count=len(entries))
+
+    return COOMatrix(rows, cols, data, (m, p))
+
+
+# =========================
+#  Однопроходное умножение
+# =========================
 
-    job2_output = run_map_reduce(job1_output, mapper_mm_job2, reducer_mm_job2)
+def mapper_mm_onepass(record, m, p):
+    """
+    Репликация: a_ik нужен всем клеткам (i, j) строки i, b_kj — всем
+    клеткам (i, j) столбца j. Ключ сразу (i, j), вторая задача не нужна.
+    """
+    tag, i_or_k, k_or_j, value = record
+
+    if tag == "A":
+        i, k = i_or_k, k_or_j
+        for j in range(p):
+            yield ((i, j), ("A", k, value))
+    else:
+        k, j = i_or_k, k_or_j
+        for i in range(m):
+            yield ((i, j), ("B", k, value))
+
+
+def reducer_mm_onepass(key, values):
+    a_by_k = {}
+    b_by_k = {}
+
+    # Повторяющиеся координаты COO складываются
+    for tag, k, val in values:
+        if tag == "A":
+            a_by_k[k] = a_by_k.get(k, 0.0) + val
+        else:
+            b_by_k[k] = b_by_k.get(k, 0.0) + val
+
+    total = 0.0
+    for k, a_ik in a_by_k.items():
+        b_kj = b_by_k.get(k)
+        if b_kj is not None:
+            total += a_ik * b_kj
+
+    if a_by_k and b_by_k:
+        yield (key, total)
+
+
+def multiply_matrices_onepass_mapreduce(A, B, executor="serial", workers=None, counters=None):
+    records, m, p = matrix_to_records(A, B)
+
+    output = run_map_reduce(records, partial(mapper_mm_onepass, m=m, p=p), reducer_mm_onepass,
+                            executor=executor, workers=workers, counters=counters)
 
     C = np.zeros((m, p), dtype=float)
-    for (i, j), value in job2_output:
+    for (i, j), value in output:
         C[i, j] = value
 
     return C
 
 
+def compare_matrix_multiplication(n=60, density=0.3, seed=0):
+    """
+    Сравнение вариантов умножения n x n: две задачи, две задачи с
+    combiner'ом и однопроходный. Печатает и возвращает число промежуточных
+    записей (выход map и после combiner'а) и время.
+    """
+    rng = np.random.default_rng(seed)
+    A = rng.random((n, n)) * (rng.random((n, n)) < density)
+    B = rng.random((n, n)) * (rng.random((n, n)) < density)
+    C_np = A @ B
+
+    def two_jobs(use_combiner):
+        counters = {}
+        C = multiply_matrices_mapreduce(A, B, counters=counters, use_combiner=use_combiner)
+        job1, job2 = counters["job1"], counters["job2"]
+        return C, {
+            "map_output_records": job1["map_output_records"] + job2["map_output_records"],
+            "shuffled_records": job1["combine_output_records"] + job2["combine_output_records"],
+        }
+
+    def one_pass():
+        counters = {}
+        C = multiply_matrices_onepass_mapreduce(A, B, counters=counters)
+        return C, {
+            "map_output_records": counters["map_output_records"],
+            "shuffled_records": counters["combine_output_records"],
+        }
+
+    variants = {
+        "two_jobs": lambda: two_jobs(False),
+        "two_jobs_combiner": lambda: two_jobs(True),
+        "one_pass": one_pass,
+    }
+
+    results = {}
+    for name, fn in variants.items():
+        t0 = time.perf_counter()
+        C, stats = fn()
+        stats["wall_s"] = time.perf_counter() - t0
+        stats["correct"] = bool(np.allclose(C, C_np))
+        results[name] = stats
+
+    print(f"Умножение {n}x{n}, плотность {density}:")
+    for name, stats in results.items():
+        print(f"  {name:18s} | map -> {stats['map_output_records']:8d} | "
+              f"shuffle -> {stats['shuffled_records']:8d} | "
+              f"{stats['wall_s']:.3f} c | верно: {stats['correct']}")
+
+    return results
+
+
+# =========================
+#  Блочное (тайловое) умножение
+# =========================
+
+def matrix_to_blocks(A, B, block_size):
+    """
+    Те же записи, что и в matrix_to_records, но вместо скаляров — тайлы
+    block_size x block_size: ("A", bi, bk, tile) и ("B", bk, bj, tile).
+    Нулевые тайлы пропускаются.
+    """
+    m, n = A.shape
+    n2, p = B.shape
+    assert n == n2
+
+    records = []
+
+    for bi, i0 in enumerate(range(0, m, block_size)):
+        for bk, k0 in enumerate(range(0, n, block_size)):
+            tile = A[i0:i0 + block_size, k0:k0 + block_size]
+            if tile.any():
+                records.append(("A", bi, bk, tile))
+
+    for bk, k0 in enumerate(range(0, n, block_size)):
+        for bj, j0 in enumerate(range(0, p, block_size)):
+            tile = B[k0:k0 + block_size, j0:j0 + block_size]
+            if tile.any():
+                records.append(("B", bk, bj, tile))
+
+    return records, m, p
+
+
+def mapper_block_job1(record):
+    tag, row_block, col_block, tile = record
+
+    if tag == "A":
+        yield (col_block, ("A", row_block, tile))
+    else:
+        yield (row_block, ("B", col_block, tile))
+
+
+def reducer_block_job1(bk, values):
+    a_tiles = []
+    b_tiles = []
+
+    for tag, index, tile in values:
+        if tag == "A":
+            a_tiles.append((index, tile))
+        else:
+            b_tiles.append((index, tile))
+
+    for bi, a_tile in a_tiles:
+        for bj, b_tile in b_tiles:
+            yield ((bi, bj), a_tile @ b_tile)
+
+
+def combiner_block_sum(key, tiles):
+    yield sum(tiles[1:], tiles[0].copy())
+
+
+def reducer_block_job2(key, tiles):
+    yield (key, sum(tiles[1:], tiles[0].copy()))
+
+
+def multiply_matrices_blocked_mapreduce(A, B, block_size=256, executor="serial", workers=None):
+    """
+    Блочный вариант multiply_matrices_mapreduce: тот же поток данных из двух
+    задач, но записи — тайлы, а reducer перемножает их через numpy (@),
+    поэтому арифметика векторизована, а число записей ~ (n / block_size)^3.
+    """
+    A = np.asarray(A, dtype=float)
+    B = np.asarray(B, dtype=float)
+    records, m, p = matrix_to_blocks(A, B, block_size)
+
+    job1_output = run_map_reduce(records, mapper_block_job1, reducer_block_job1,
+                                 executor=executor, workers=workers)
+
+    job2_output = run_map_reduce(job1_output, mapper_mm_job2, reducer_block_job2,
+                                 combiner=combiner_block_sum,
+                                 executor=executor, workers=workers)
+
+    C = np.zeros((m, p), dtype=float)
+    for (bi, bj), tile in job2_output:
+        i0 = bi * block_size
+        j0 = bj * block_size
+        C[i0:i0 + tile.shape[0], j0:j0 + tile.shape[1]] = tile
+
+    return C
+
+
+# =========================
+#  Out-of-core: матрицы в .npy через mmap
+# =========================
+
+def npy_shape(path):
+    return np.load(path, mmap_mode="r").shape
+
+
+def npy_row_stripes(path, stripe_rows):
+    n_rows = npy_shape(path)[0]
+    return [(path, r0, min(r0 + stripe_rows, n_rows)) for r0 in range(0, n_rows, stripe_rows)]
+
+
+def mapper_mm_npy(record, b_path, block_cols):
+    """
+    Запись — полоса строк A (путь, i0, i1). Для каждой полосы столбцов B
+    выдаём ключ блока результата (i0, j0); сами данные не копируются,
+    в значении только координаты.
+    """
+    a_path, i0, i1 = record
+    p = npy_shape(b_path)[1]
+
+    for j0 in range(0, p, block_cols):
+        yield ((i0, j0), (a_path, i1, b_path, min(j0 + block_cols, p)))
+
+
+def reducer_mm_npy(key, values, out_path, k_chunk):
+    """
+    Блок C[i0:i1, j0:j1] считается по кускам k_chunk столбцов A / строк B,
+    читаемым из mmap, и записывается прямо в mmap-файл результата.
+    Память: ~ (i1-i0)*k_chunk + k_chunk*(j1-j0) + (i1-i0)*(j1-j0) чисел.
+    """
+    i0, j0 = key
+
+    for a_path, i1, b_path, j1 in values:
+        A = np.load(a_path, mmap_mode="r")
+        B = np.load(b_path, mmap_mode="r")
+        n = A.shape[1]
+
+        block = np.zeros((i1 - i0, j1 - j0), dtype=np.result_type(A.dtype, B.dtype, float))
+        for k0 in range(0, n, k_chunk):
+            k1 = min(k0 + k_chunk, n)
+            block += A[i0:i1, k0:k1] @ B[k0:k1, j0:j1]
+
+        C = np.load(out_path, mmap_mode="r+")
+        C[i0:i1, j0:j1] = block
+        C.flush()
+        del C
+
+        yield (key, block.shape)
+
+
+def multiply_matrices_npy_mapreduce(a_path, b_path, out_path, block_rows=1024, block_cols=1024,
+                                    k_chunk=1024, executor="serial", workers=None):
+    """
+    Умножение матриц, лежащих в .npy, без загрузки их в память: входы
+    открываются через mmap, по задаче MapReduce идут полосы строк A и
+    столбцов B, результат пишется в mmap-файл out_path (.npy), который
+    и возвращается (в режиме только чтения).
+    """
+    A = np.load(a_path, mmap_mode="r")
+    B = np.load(b_path, mmap_mode="r")
+    m, n = A.shape
+    n2, p = B.shape
+    assert n == n2
+
+    dtype = np.result_type(A.dtype, B.dtype, float)
+    del A, B
+
+    C = np.lib.format.open_memmap(out_path, mode="w+", dtype=dtype, shape=(m, p))
+    del C
+
+    run_map_reduce(
+        npy_row_stripes(a_path, block_rows),
+        partial(mapper_mm_npy, b_path=b_path, block_cols=block_cols),
+        partial(reducer_mm_npy, out_path=out_path, k_chunk=k_chunk),
+        executor=executor, workers=workers,
+    )
+
+    return np.load(out_path, mmap_mode="r")
+
+
+def mapper_lr_npy(record):
+    """Запись — диапазон строк (x_path, y_path, r0, r1) в .npy-файлах."""
+    x_path, y_path, r0, r1 = record
+    X = np.load(x_path, mmap_mode="r")[r0:r1]
+    y = np.load(y_path, mmap_mode="r")[r0:r1]
+
+    yield from mapper_lr_chunk((X, y))
+
+
+def linear_regression_npy_mapreduce(x_path, y_path, chunk_rows=100_000, ridge=0.0,
+                                    executor="serial", workers=None, intercept=None):
+    """
+    Линейная регрессия по X и y из .npy через mmap: каждая запись —
+    кусок из chunk_rows строк, в памяти одновременно только он.
+    """
+    records = [(x_path, y_path, r0, r1) for _, r0, r1 in npy_row_stripes(x_path, chunk_rows)]
+
+    mr_output = run_map_reduce(records, mapper_lr_npy, reducer_lr, combiner=combiner_lr,
+                               executor=executor, workers=workers)
+
+    _, (S_xx, S_xy) = mr_output[0]
+
+    w = solve_normal_equations(S_xx, S_xy, ridge, intercept)
+    return w, S_xx, S_xy
+
+
 def mapper_lr(record):
     x, y = record
     x = np.asarray(x, dtype=float)
@@ -123,15 +531,277 @@ def reducer_lr(key, values):
     yield (key, (S_xx, S_xy))
 
 
-def linear_regression_mapreduce(dataset):
-    mr_output = run_map_reduce(dataset, mapper_lr, reducer_lr)
+def mapper_lr_chunk(record):
+    """
+    Запись — кусок строк (X_chunk, y_chunk): вместо np.outer по каждой
+    строке одна матричная операция X^T X на весь кусок.
+    """
+    X, y = record
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    yield ("stats", ("XX", X.T @ X, X.T @ y))
+
+
+def combiner_lr(key, values):
+    # предварительная сумма X^T X и X^T y внутри одной map-задачи
+    for _, (S_xx, S_xy) in reducer_lr(key, values):
+        yield ("XX", S_xx, S_xy)
+
+
+def iter_lr_chunks(dataset, chunk_rows):
+    """
+    Приводит вход регрессии к потоку кусков (X_chunk, y_chunk):
+    - кортеж (X, y) из numpy-массивов режется на куски по chunk_rows строк;
+    - список пар (x, y) по строкам (исходный формат) склеивается в куски;
+    - любой другой итерируемый объект считается уже готовым потоком
+      кусков (X_chunk, y_chunk), например читаемым с диска, и не трогается.
+    """
+    if isinstance(dataset, tuple) and len(dataset) == 2 and np.ndim(dataset[0]) == 2:
+        X, y = dataset
+        return ((X[r0:r0 + chunk_rows], y[r0:r0 + chunk_rows])
+                for r0 in range(0, len(X), chunk_rows))
+
+    if isinstance(dataset, list):
+        chunks = []
+        for r0 in range(0, len(dataset), chunk_rows):
+            rows = dataset[r0:r0 + chunk_rows]
+            X = np.array([x for x, _ in rows], dtype=float)
+            y = np.array([y for _, y in rows], dtype=float)
+            chunks.append((X, y))
+        return chunks
+
+    return dataset
+
+
+def forward_substitution(L, b):
+    """Решение L x = b для нижнетреугольной L за O(n^2)."""
+    x = np.zeros(np.shape(b), dtype=float)
+    for i in range(L.shape[0]):
+        x[i] = (b[i] - L[i, :i] @ x[:i]) / L[i, i]
+    return x
+
+
+def back_substitution(U, b):
+    """Решение U x = b для верхнетреугольной U за O(n^2)."""
+    x = np.zeros(np.shape(b), dtype=float)
+    for i in range(U.shape[0] - 1, -1, -1):
+        x[i] = (b[i] - U[i, i + 1:] @ x[i + 1:]) / U[i, i]
+    return x
+
+
+# Выше этой оценки числа обусловленности нормальные уравнения решаем через lstsq
+COND_LIMIT = 1e12
+
+
+def ridge_penalty(d, ridge, intercept=None):
+    """Диагональ L2-штрафа: ridge для всех признаков, кроме столбца intercept."""
+    penalty = np.full(d, float(ridge))
+    if intercept is not None:
+        penalty[intercept] = 0.0
+    return penalty
+
+
+def solve_normal_equations(S_xx, S_xy, ridge=0.0, intercept=None):
+    """
+    Решение (X^T X + ridge * I) w = X^T y через разложение Холецкого и две
+    треугольные подстановки вместо явного обращения. intercept — номер
+    столбца из единиц, он не регуляризуется (None — штрафуются все
+    коэффициенты). Если Холецкий не проходит (матрица не положительно
+    определена) или по диагонали L видно плохую обусловленность
+    (cond(A) >= (max diag L / min diag L)^2 > COND_LIMIT) — через lstsq.
+    """
+    A = S_xx + np.diag(ridge_penalty(S_xx.shape[0], ridge, intercept)) if ridge else S_xx
+
+    try:
+        L = np.linalg.cholesky(A)
+    except np.linalg.LinAlgError:
+        return np.linalg.lstsq(A, S_xy, rcond=None)[0]
+
+    diag = np.diag(L)
+    if diag.min() <= 0 or (diag.max() / diag.min()) ** 2 > COND_LIMIT:
+        return np.linalg.lstsq(A, S_xy, rcond=None)[0]
+
+    z = forward_substitution(L, S_xy)
+    return back_substitution(L.T, z)
+
+
+def linear_regression_mapreduce(dataset, executor="serial", workers=None, ridge=0.0,
+                                chunk_rows=10_000, intercept=None):
+    """
+    dataset — кортеж (X, y), список строк (x, y) или поток кусков
+    (X_chunk, y_chunk) с диска (см. iter_lr_chunks). ridge > 0 добавляет
+    L2-регуляризацию (кроме столбца intercept, если он задан).
+    """
+    chunks = iter_lr_chunks(dataset, chunk_rows)
+
+    mr_output = run_map_reduce(chunks, mapper_lr_chunk, reducer_lr, combiner=combiner_lr,
+                               executor=executor, workers=workers)
 
     _, (S_xx, S_xy) = mr_output[0]
 
-    w = np.linalg.inv(S_xx) @ S_xy
+    w = solve_normal_equations(S_xx, S_xy, ridge, intercept)
     return w, S_xx, S_xy
 
 
+# =========================
+#  Итеративная регрессия: (мини-батч) градиентный спуск
+# =========================
+
+def partition_dataset(X, y, n_partitions):
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    bounds = np.linspace(0, len(X), n_partitions + 1).astype(int)
+    return [(X[r0:r1], y[r0:r1]) for r0, r1 in zip(bounds[:-1], bounds[1:]) if r1 > r0]
+
+
+def mapper_gd(partition, w, iteration, batch_size, seed):
+    """
+    Частичный градиент MSE по одной партиции (или по её мини-батчу):
+    ("grad", (X^T (Xw - y), число строк, сумма квадратов ошибок)).
+    Память O(d), матрица d x d не строится.
+    """
+    part_id, X, y = partition
+
+    if batch_size is not None and batch_size < len(X):
+        rng = np.random.default_rng((seed, iteration, part_id))
+        idx = rng.integers(0, len(X), size=batch_size)
+        X = X[idx]
+        y = y[idx]
+
+    residual = X @ w - y
+    yield ("grad", (X.T @ residual, len(X), float(residual @ residual)))
+
+
+def reducer_gd(key, values):
+    grad_sum = None
+    n = 0
+    sse = 0.0
+
+    for g, n_part, sse_part in values:
+        grad_sum = g.copy() if grad_sum is None else grad_sum + g
+        n += n_part
+        sse += sse_part
+
+    yield (key, (grad_sum, n, sse))
+
+
+def _map_cached(partitions, w, iteration, batch_size, seed):
+    # map по всем партициям воркера + combiner (сумма) внутри воркера
+    values = [value for part in partitions
+              for _, value in mapper_gd(part, w, iteration, batch_size, seed)]
+    return next(reducer_gd("grad", values))[1]
+
+
+def _partition_worker(conn, partitions):
+    while True:
+        msg = conn.recv()
+        if msg is None:
+            break
+        conn.send(_map_cached(partitions, *msg))
+    conn.close()
+
+
+class CachedPartitions:
+    """
+    Аналог закешированного RDD в Spark: партиции один раз раздаются
+    воркерам и живут в их памяти между итерациями; на каждой итерации
+    воркерам пересылается только вектор w (d чисел).
+    executor: "serial" (всё в текущем процессе) или "process".
+    """
+
+    def __init__(self, partitions, executor="serial", workers=None):
+        partitions = [(i, X, y) for i, (X, y) in enumerate(partitions)]
+
+        if executor == "serial":
+            self.local = partitions
+            self.workers = []
+            return
+        if executor != "process":
+            raise ValueError(f"Неизвестный исполнитель {executor!r}, ожидается 'serial' или 'process'")
+
+        self.local = None
+        self.workers = []
+        n_workers = min(workers or os.cpu_count() or 1, len(partitions))
+        for w_id in range(n_workers):
+            parent_conn, child_conn = multiprocessing.Pipe()
+            proc = multiprocessing.Process(
+                target=_partition_worker,
+                args=(child_conn, partitions[w_id::n_workers]),
+                daemon=True,
+            )
+            proc.start()
+            child_conn.close()
+            self.workers.append((proc, parent_conn))
+
+    def map(self, w, iteration, batch_size, seed):
+        if self.local is not None:
+            return [_map_cached(self.local, w, iteration, batch_size, seed)]
+
+        for _, conn in self.workers:
+            conn.send((w, iteration, batch_size, seed))
+        return [conn.recv() for _, conn in self.workers]
+
+    def close(self):
+        for proc, conn in self.workers:
+            conn.send(None)
+            conn.close()
+            proc.join()
+        self.workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def gradient_descent_mapreduce(X, y, lr=0.1, n_iters=1000, batch_size=None, tol=1e-8,
+                               patience=20, ridge=0.0, n_partitions=4, executor="serial",
+                               workers=None, seed=0, intercept=None):
+    """
+    Итеративная линейная регрессия без матрицы X^T X: на каждой итерации
+    mapper'ы считают частичные градиенты по закешированным партициям,
+    reducer усредняет их, драйвер делает шаг w -= lr * grad.
+    batch_size — размер мини-батча на партицию (None — полный градиент).
+    Остановка: норма градиента < tol или loss не улучшался patience итераций.
+    intercept — номер столбца из единиц, не входящего в L2-штраф.
+    Возвращает (w, history), где history — loss (MSE) по итерациям.
+    """
+    partitions = partition_dataset(X, y, n_partitions)
+    d = partitions[0][0].shape[1]
+    w = np.zeros(d)
+    penalty = ridge_penalty(d, ridge, intercept)
+
+    history = []
+    best_loss = np.inf
+    stale = 0
+
+    with CachedPartitions(partitions, executor, workers) as cached:
+        for iteration in range(n_iters):
+            values = cached.map(w, iteration, batch_size, seed)
+            _, (grad_sum, n, sse) = next(reducer_gd("grad", values))
+
+            grad = grad_sum / n + penalty * w
+            loss = sse / n
+            history.append(loss)
+
+            if np.linalg.norm(grad) < tol:
+                break
+
+            if loss < best_loss - tol:
+                best_loss = loss
+                stale = 0
+            else:
+                stale += 1
+                if stale >= patience:
+                    break
+
+            w = w - lr * grad
+
+    return w, history
+
+
 def demo_matrix_multiplication():
     print("=== Демонстрация: произведение матриц через MapReduce ===")
     A = np.array([[1, 2, 3],
@@ -155,6 +825,28 @@ def demo_matrix_multiplication():
     print()
 
 
+def demo_block_multiplication(n=1000, block_size=250):
+    print(f"=== Демонстрация: блочное произведение матриц {n}x{n} через MapReduce ===")
+    rng = np.random.default_rng(0)
+    A = rng.random((n, n))
+    B = rng.random((n, n))
+
+    t0 = time.perf_counter()
+    C_mr = multiply_matrices_blocked_mapreduce(A, B, block_size=block_size)
+    t_block = time.perf_counter() - t0
+
+    small = 40
+    t0 = time.perf_counter()
+    multiply_matrices_mapreduce(A[:small, :small], B[:small, :small])
+    t_scalar = time.perf_counter() - t0
+
+    print(f"Блочный MapReduce (тайл {block_size}): {t_block:.3f} c, "
+          f"совпадает с numpy: {np.allclose(C_mr, A @ B)}")
+    print(f"Скалярный MapReduce уже на {small}x{small}: {t_scalar:.3f} c "
+          f"(время растёт как n^3: на {n}x{n} это ~{t_scalar * (n / small) ** 3:.0f} c)")
+    print()
+
+
 def demo_linear_regression():
     print("=== Демонстрация: линейная регрессия через MapReduce ===")
     dataset = [
@@ -185,6 +877,23 @@ def demo_linear_regression():
     print()
 
 
+def demo_gradient_descent(n=20_000, d=50):
+    print(f"=== Демонстрация: мини-батч градиентный спуск ({n}x{d}) через MapReduce ===")
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(n, d))
+    w_true = rng.normal(size=d)
+    y = X @ w_true + rng.normal(scale=0.1, size=n)
+
+    w, history = gradient_descent_mapreduce(X, y, lr=0.1, batch_size=256)
+    print(f"Итераций: {len(history)}, итоговый MSE на батче: {history[-1]:.5f}")
+    print(f"Макс. отклонение от истинных весов: {np.max(np.abs(w - w_true)):.4f}")
+    print()
+
+
 if __name__ == "__main__":
     demo_matrix_multiplication()
+    demo_block_multiplication()
+    compare_matrix_multiplication()
+    print()
     demo_linear_regression()
+    demo_gradient_descent()
@@ -0,0 +1,165 @@
+"""
+MapReduce job для вычисления среднего рейтинга по категориям Yelp.
+
+Результат: category -> [avg_rating, n_business], только для категорий,
+где не меньше --min-business заведений (HAVING COUNT(*) >= N).
+
+Запуск через mrjob (аналог Hadoop Streaming):
+    python yelp_business_mrjob.py yelp_academic_dataset_business.json > mr_output.txt
+
+Быстрый локальный запуск без mrjob (без JSON-сериализации каждой пары
+между стадиями, по процессам), вывод совпадает с выводом mrjob:
+    python yelp_business_mrjob.py --local yelp_academic_dataset_business.json > mr_output.txt
+"""
+import json
+import os
+import sys
+from functools import partial
+
+try:
+    from mrjob.job import MRJob
+except ImportError:  # локальный раннер работает и без mrjob
+    MRJob = object
+
+try:
+    import mapreduce_engine
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    try:
+        import mapreduce_engine
+    except ImportError:  # в Colab рядом только этот файл: доступен запуск через mrjob
+        mapreduce_engine = None
+
+MIN_BUSINESS = 20
+
+
+def map_categories(line):
+    # Парсим JSON-строку
+    try:
+        row = json.loads(line)
+    except ValueError:
+        return
+
+    stars = row.get("stars")
+    categories = row.get("categories")
+
+    # Если нет рейтинга или категорий — пропускаем
+    if stars is None or categories is None:
+        return
+
+    # categories — строка вида "Restaurants, Pizza, Italian"
+    for cat in categories.split(","):
+        cat = cat.strip()
+        if not cat:
+            continue
+        # Выдаём (category) -> (stars, 1)
+        yield cat, (stars, 1)
+
+
+def combine_stats(values):
+    # values — последовательность (stars, n) или уже частичных (sum, count)
+    total_stars = 0.0
+    total_count = 0
+    for stars, cnt in values:
+        total_stars += float(stars)
+        total_count += cnt
+    return total_stars, total_count
+
+
+def reduce_stats(values, min_business=MIN_BUSINESS):
+    total_stars, total_count = combine_stats(values)
+    if total_count > 0 and total_count >= min_business:
+        return total_stars / total_count, total_count
+    return None
+
+
+class YelpBusinessCategoryRating(MRJob):
+    """
+    MapReduce job для вычисления среднего рейтинга по категориям.
+    Это аналог Hadoop Streaming: mapper + combiner + reducer.
+    """
+
+    def configure_args(self):
+        super().configure_args()
+        self.add_passthru_arg("--min-business", type=int, default=MIN_BUSINESS)
+
+    def mapper(self, _, line):
+        yield from map_categories(line)
+
+    def combiner(self, category, values):
+        # Частичные суммы внутри map-задачи: в shuffle уходит одна пара на категорию
+        yield category, combine_stats(values)
+
+    def reducer(self, category, values):
+        result = reduce_stats(values, self.options.min_business)
+        if result is not None:
+            # Результат: category -> (средний рейтинг, число заведений)
+            yield category, result
+
+
+# =========================
+#  Локальный раннер без mrjob
+# =========================
+
+def split_mapper(split):
+    for line in mapreduce_engine.read_split_lines(*split):
+        yield from map_categories(line)
+
+
+def engine_combiner(category, values):
+    yield combine_stats(values)
+
+
+def engine_reducer(category, values, min_business=MIN_BUSINESS):
+    result = reduce_stats(values, min_business)
+    if result is not None:
+        yield category, result
+
+
+def run_local(path, min_business=MIN_BUSINESS, workers=None, executor="process"):
+    """
+    Та же задача на mapreduce_engine: сплиты файла по процессам, combiner
+    внутри map-задачи, пары передаются без текстовой сериализации.
+    Возвращает список (category, (avg_rating, n_business)) в порядке,
+    в котором их выводит mrjob (сортировка по JSON-ключу).
+    """
+    if mapreduce_engine is None:
+        raise RuntimeError("Для локального раннера нужен mapreduce_engine.py из репозитория")
+
+    workers = workers or os.cpu_count() or 1
+    splits = [(path, start, end)
+              for start, end in mapreduce_engine.file_splits(path, workers * 4)]
+
+    results = mapreduce_engine.run(
+        splits, split_mapper, partial(engine_reducer, min_business=min_business),
+        combiner=engine_combiner,
+        executor=executor,
+        workers=workers,
+    )
+
+    return sorted(results, key=lambda kv: json.dumps(kv[0]).encode("utf-8"))
+
+
+def format_output(results):
+    """Строки в формате JSONProtocol mrjob: JSON-ключ, таб, JSON-значение."""
+    for category, value in results:
+        yield f"{json.dumps(category)}\t{json.dumps(list(value))}"
+
+
+def main_local(argv):
+    min_business = MIN_BUSINESS
+    if "--min-business" in argv:
+        i = argv.index("--min-business")
+        min_business = int(argv[i + 1])
+        del argv[i:i + 2]
+
+    path = argv[0]
+    for line in format_output(run_local(path, min_business)):
+        print(line)
+
+
+if __name__ == "__main__":
+    if "--local" in sys.argv[1:]:
+        main_local([arg for arg in sys.argv[1:] if arg != "--local"])
+    else:
+        YelpBusinessCategoryRating.run()
@@ -0,0 +1,492 @@
+"""
+Пайплайн Prefect (аналог DAG в Airflow): check_file → spark_mart → export_to_csv.
+
+Результаты шагов кешируются по содержимому входов (content-addressed):
+- ключ check_file — размер, mtime и выборочный sha1 исходного файла;
+- ключ остальных шагов — ключ предыдущего шага + версия кода шага + параметры.
+Если ключ уже есть в манифесте, а выход шага помечен этим же ключом
+(выходы пишутся по фиксированным путям и перезаписываются другими
+запусками), шаг не выполняется и сразу возвращает ранее записанный Parquet/CSV. Попадания, промахи и
+сэкономленное время печатаются в конце каждого запуска.
+
+Витрина ведётся инкрементально: частичные агрегаты по категориям хранятся
+в партиционированном Parquet, дописанные в файл записи сливаются только
+в затронутые партиции. CSV выгружается потоково, без загрузки в pandas.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+from collections import namedtuple
+
+from prefect import flow, task
+
+CACHE_DIR = ".pipeline_cache"
+
+HASH_SAMPLE_BYTES = 1 << 20
+
+HASH_SAMPLES = 3
+
+MIN_BUSINESS = 20
+
+MART_STATE_PATH = "mart_yelp_categories_state"
+
+MART_BUCKETS = 16
+
+# Версии кода шагов: меняем при изменении логики, чтобы кеш сбросился
+CHECK_FILE_VERSION = "check_file:v1"
+SPARK_MART_VERSION = "spark_mart:v3"
+EXPORT_CSV_VERSION = "export_to_csv:v2"
+
+StepResult = namedtuple("StepResult", ["path", "key", "hit", "seconds"])
+
+
+def file_fingerprint(path):
+    """
+    Размер, mtime и sha1 по HASH_SAMPLES кускам файла (начало, середина,
+    конец) по HASH_SAMPLE_BYTES: полный хеш многогигабайтного файла дорог.
+    """
+    st = os.stat(path)
+    h = hashlib.sha1()
+
+    with open(path, "rb") as f:
+        if st.st_size <= HASH_SAMPLE_BYTES * HASH_SAMPLES:
+            h.update(f.read())
+        else:
+            step = (st.st_size - HASH_SAMPLE_BYTES) // (HASH_SAMPLES - 1)
+            for i in range(HASH_SAMPLES):
+                f.seek(i * step)
+                h.update(f.read(HASH_SAMPLE_BYTES))
+
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": h.hexdigest()}
+
+
+def make_key(*parts):
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _manifest_path(step):
+    return os.path.join(CACHE_DIR, f"{step}.json")
+
+
+def _key_marker(output):
+    """
+    Файл с ключом, которым построен выход: внутри каталога (Spark и pyarrow
+    пропускают файлы на "_", перезапись каталога удаляет и метку) или рядом с файлом.
+    """
+    if os.path.isdir(output):
+        return os.path.join(output, "_CACHE_KEY")
+    return output + ".cachekey"
+
+
+def read_key_marker(output):
+    marker = _key_marker(output)
+    if not os.path.exists(marker):
+        return None
+    with open(marker, "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def write_key_marker(output, key):
+    with open(_key_marker(output), "w", encoding="utf-8") as f:
+        f.write(key)
+
+
+def clear_key_marker(output):
+    if os.path.exists(output) and os.path.exists(_key_marker(output)):
+        os.remove(_key_marker(output))
+
+
+def cache_lookup(step, key):
+    """
+    Запись манифеста для ключа, если выход шага существует и построен
+    именно с этим ключом (а не перезаписан запуском с другими входами).
+    """
+    path = _manifest_path(step)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+
+    entry = entries.get(key)
+    if entry is None or not os.path.exists(entry["output"]):
+        return None
+    if read_key_marker(entry["output"]) != key:
+        return None
+    return entry
+
+
+def cache_store(step, key, output, seconds):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _manifest_path(step)
+
+    entries = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+
+    entries[key] = {"output": output, "seconds": seconds, "created": time.time()}
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def run_cached(step, key, output, compute):
+    """
+    Выполняет compute() -> путь к выходу output, только если для key нет
+    актуальной записи в кеше. seconds в результате — время работы шага
+    при промахе или сэкономленное время (время исходного запуска) при попадании.
+    """
+    entry = cache_lookup(step, key)
+    if entry is not None:
+        print(f"[cache] {step}: HIT {key[:12]} → {entry['output']} "
+              f"(сэкономлено ~{entry['seconds']:.1f} c)")
+        return StepResult(entry["output"], key, True, entry["seconds"])
+
+    # Старая метка не должна пережить перезапись выхода (в т.ч. неудачную)
+    clear_key_marker(output)
+    t0 = time.perf_counter()
+    output = compute()
+    seconds = time.perf_counter() - t0
+    write_key_marker(output, key)
+    cache_store(step, key, output, seconds)
+    print(f"[cache] {step}: MISS {key[:12]} → {output} ({seconds:.1f} c)")
+    return StepResult(output, key, False, seconds)
+
+
+@task
+def check_file(path: str):
+    """
+    Проверка наличия исходных данных.
+    Аналог первой задачи DAG в Airflow:
+    'проверить, что данные доступны'.
+    Ключ кеша — отпечаток содержимого файла.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Файл {path} не найден")
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    print(f"Файл {path} найден, размер ~{size_mb:.2f} MB")
+
+    t0 = time.perf_counter()
+    key = make_key(CHECK_FILE_VERSION, os.path.abspath(path), file_fingerprint(path))
+    return StepResult(path, key, False, time.perf_counter() - t0)
+
+
+def complete_lines_end(path):
+    """Смещение конца последней полной строки (недописанный хвост не читаем)."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        pos = size
+        while pos > 0:
+            start = max(0, pos - HASH_SAMPLE_BYTES)
+            f.seek(start)
+            block = f.read(pos - start)
+            nl = block.rfind(b"\n")
+            if nl != -1:
+                return start + nl + 1
+            pos = start
+    return 0
+
+
+def prefix_sha1(path, length):
+    """
+    sha1 по первым и последним HASH_SAMPLE_BYTES байтам префикса [0, length)
+    (как в Lab1: полный хеш многогигабайтного файла слишком дорог).
+    """
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        h.update(f.read(min(length, HASH_SAMPLE_BYTES)))
+        if length > HASH_SAMPLE_BYTES:
+            f.seek(max(HASH_SAMPLE_BYTES, length - HASH_SAMPLE_BYTES))
+            h.update(f.read(length - f.tell()))
+    return h.hexdigest()
+
+
+def _mart_checkpoint_path():
+    return os.path.join(CACHE_DIR, "mart_checkpoint.json")
+
+
+def state_generation_path(state_path, generation):
+    """Каталог одного поколения состояния витрины."""
+    return os.path.join(state_path, f"gen={generation}")
+
+
+def drop_old_generations(state_path, generation):
+    """Удаляет всё в state_path, кроме текущего поколения (в т.ч. недописанные)."""
+    keep = os.path.basename(state_generation_path(state_path, generation))
+    for name in os.listdir(state_path):
+        if name != keep:
+            entry = os.path.join(state_path, name)
+            if os.path.isdir(entry):
+                shutil.rmtree(entry, ignore_errors=True)
+            else:
+                os.remove(entry)
+
+
+def load_mart_checkpoint(path, state_path, buckets):
+    """
+    Чекпоинт инкрементальной витрины, если он относится к этому файлу,
+    уже обработанная часть файла не изменилась и его поколение состояния
+    на диске. Иначе None — витрину нужно пересобрать полностью.
+    """
+    ckpt_path = _mart_checkpoint_path()
+    if not os.path.exists(ckpt_path):
+        return None
+
+    with open(ckpt_path, "r", encoding="utf-8") as f:
+        ckpt = json.load(f)
+
+    if ckpt["path"] != os.path.abspath(path) or ckpt["state_path"] != state_path:
+        return None
+    if ckpt["buckets"] != buckets or "generation" not in ckpt:
+        return None
+    if not os.path.exists(state_generation_path(state_path, ckpt["generation"])):
+        return None
+    if os.path.getsize(path) < ckpt["offset"]:
+        return None
+    if prefix_sha1(path, ckpt["offset"]) != ckpt.get("prefix_sha1"):
+        return None
+    return ckpt
+
+
+def save_mart_checkpoint(path, state_path, buckets, generation, offset, out_path, min_business):
+    """
+    Атомарно (os.replace) переключает витрину на новое поколение состояния
+    и смещение: до этого момента действует предыдущий чекпоинт.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    ckpt = {
+        "path": os.path.abspath(path),
+        "state_path": state_path,
+        "buckets": buckets,
+        "generation": generation,
+        "offset": offset,
+        "prefix_sha1": prefix_sha1(path, offset),
+        "out_path": out_path,
+        "min_business": min_business,
+    }
+    tmp_path = _mart_checkpoint_path() + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(ckpt, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, _mart_checkpoint_path())
+
+
+def write_delta(path, start, end):
+    """Копирует дописанные строки [start, end) во временный JSON-lines файл."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    delta_path = os.path.join(CACHE_DIR, "delta.json")
+    with open(path, "rb") as src, open(delta_path, "wb") as dst:
+        src.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = src.read(min(remaining, HASH_SAMPLE_BYTES))
+            if not block:
+                break
+            dst.write(block)
+            remaining -= len(block)
+    return delta_path
+
+
+def category_partials(df, buckets):
+    """Частичные агрегаты (sum_stars, n_business) по категориям + номер бакета."""
+    from pyspark.sql.functions import split, explode, trim, col, count, lit, pmod
+    from pyspark.sql.functions import hash as spark_hash, sum as sum_
+
+    df_cat = (
+        df.withColumn("category", explode(split(col("categories"), ",")))
+          .withColumn("category", trim(col("category")))
+          .filter(col("category") != "")
+          .filter(col("stars").isNotNull())
+    )
+
+    return (
+        df_cat.groupBy("category")
+              .agg(
+                  sum_("stars").alias("sum_stars"),
+                  count("*").alias("n_business")
+              )
+              .withColumn("bucket", pmod(spark_hash(col("category")), lit(buckets)))
+    )
+
+
+def build_mart(path: str, out_path: str, min_business: int = MIN_BUSINESS,
+               state_path: str = MART_STATE_PATH, buckets: int = MART_BUCKETS):
+    """
+    Инкрементальная витрина. В state_path лежат частичные агрегаты
+    (category, sum_stars, n_business), разбитые на buckets партиций по хешу
+    категории. Новые строки файла (после смещения из чекпоинта) агрегируются
+    отдельно и сливаются с состоянием только в затронутых партициях;
+    витрина out_path перезаписывается тоже только в них
+    (partitionOverwriteMode=dynamic). Если начало файла изменилось —
+    полная пересборка.
+
+    Состояние хранится поколениями (state_path/gen=N): новое поколение —
+    копия текущего с перезаписанными партициями, текущее не меняется, пока
+    чекпоинт (смещение + номер поколения) не переключен на новое одним
+    os.replace. При сбое до этого следующий запуск повторит ту же дельту от
+    старого поколения; запись витрины по одному и тому же состоянию
+    идемпотентна, поэтому двойного учёта нет.
+    """
+    from pyspark.sql import SparkSession
+    from pyspark.sql.functions import col
+    from pyspark.sql.functions import sum as sum_
+
+    spark = SparkSession.builder.appName("PrefectYelpJob").getOrCreate()
+
+    end = complete_lines_end(path)
+    ckpt = load_mart_checkpoint(path, state_path, buckets)
+    full = ckpt is None
+    # Витрина не соответствует состоянию (другой порог HAVING или путь) —
+    # пересчитываем её по всему состоянию
+    rebuild_mart = not full and (
+        ckpt["min_business"] != min_business
+        or ckpt["out_path"] != out_path
+        or not os.path.exists(out_path)
+    )
+
+    if full:
+        source = path
+    elif ckpt["offset"] == end and not rebuild_mart:
+        print(f"Новых записей нет, витрина {out_path} актуальна")
+        return out_path
+    else:
+        source = write_delta(path, ckpt["offset"], end)
+
+    df = spark.read.schema("stars DOUBLE, categories STRING").json(source)
+    delta = category_partials(df, buckets)
+
+    os.makedirs(state_path, exist_ok=True)
+    if full:
+        # Номер больше любого оставшегося на диске, чтобы не писать поверх
+        generation = 1 + max(
+            (int(name[len("gen="):]) for name in os.listdir(state_path)
+             if name.startswith("gen=") and name[len("gen="):].isdigit()),
+            default=-1
+        )
+    else:
+        generation = ckpt["generation"] + 1
+    new_state_path = state_generation_path(state_path, generation)
+    shutil.rmtree(new_state_path, ignore_errors=True)
+
+    if full:
+        state = delta
+        touched = None
+    else:
+        old_state_path = state_generation_path(state_path, ckpt["generation"])
+        touched = [row.bucket for row in delta.select("bucket").distinct().collect()]
+        old = spark.read.parquet(old_state_path).filter(col("bucket").isin(touched))
+        state = (
+            old.unionByName(delta)
+               .groupBy("bucket", "category")
+               .agg(
+                   sum_("sum_stars").alias("sum_stars"),
+                   sum_("n_business").alias("n_business")
+               )
+        )
+        # Нетронутые партиции переходят в новое поколение копированием файлов
+        shutil.copytree(old_state_path, new_state_path)
+
+    # static — перезаписать всё, dynamic — только партиции, которые есть в данных.
+    # Режим задаётся опцией записи, а не в общей сессии Spark
+    overwrite_mode = "static" if full else "dynamic"
+    if full or touched:
+        (state.write.partitionBy("bucket").mode("overwrite")
+              .option("partitionOverwriteMode", overwrite_mode).parquet(new_state_path))
+        changed = buckets if full else len(touched)
+        print(f"Состояние обновлено в {new_state_path}: партиций {changed} из {buckets}")
+
+    if full or rebuild_mart:
+        # Витрину строим по записанному состоянию, а не пересчитываем JSON
+        overwrite_mode = "static"
+        state = spark.read.parquet(new_state_path)
+        touched = None
+
+    mart = (
+        state.withColumn("avg_rating", col("sum_stars") / col("n_business"))
+             .filter(col("n_business") >= min_business)
+             .select("category", "avg_rating", "n_business", "bucket")
+    )
+    if touched is None or touched:
+        (mart.write.partitionBy("bucket").mode("overwrite")
+             .option("partitionOverwriteMode", overwrite_mode).parquet(out_path))
+        print(f"Витрина сохранена в {out_path}")
+
+    save_mart_checkpoint(path, state_path, buckets, generation, end, out_path, min_business)
+    drop_old_generations(state_path, generation)
+    if not full:
+        os.remove(source)
+    return out_path
+
+
+@task
+def spark_mart(src: StepResult, out_path: str = "mart_yelp_categories_prefect",
+               min_business: int = MIN_BUSINESS):
+    """
+    Spark-задача: считает витрину категорий (avg_rating, n_business)
+    и сохраняет её в формате Parquet, партиционированном по бакетам
+    категорий. При неизменном входе берётся из кеша, при дописанном —
+    обновляется инкрементально (build_mart).
+    """
+    key = make_key(SPARK_MART_VERSION, src.key, out_path, min_business)
+    return run_cached("spark_mart", key, out_path, lambda: build_mart(src.path, out_path, min_business))
+
+
+def write_csv(parquet_path: str, csv_path: str, batch_size: int = 64 * 1024):
+    """
+    Потоковая конвертация Parquet → CSV через pyarrow: витрина читается
+    батчами по партициям и сразу дописывается в файл, целиком в память
+    (и в pandas) не загружается.
+    """
+    import pyarrow.csv as pacsv
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(parquet_path, format="parquet", partitioning="hive")
+    scanner = dataset.scanner(columns=["category", "avg_rating", "n_business"],
+                              batch_size=batch_size)
+
+    tmp_path = csv_path + ".tmp"
+    rows = 0
+    with pacsv.CSVWriter(tmp_path, scanner.projected_schema) as writer:
+        for batch in scanner.to_batches():
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    os.replace(tmp_path, csv_path)
+
+    print(f"CSV с витриной сохранён в {csv_path} ({rows} строк)")
+    return csv_path
+
+
+@task
+def export_to_csv(mart: StepResult, csv_path: str = "yelp_categories_mart.csv"):
+    """
+    Экспорт витрины в CSV для пользователя / BI-инструмента.
+    Это финальная часть конвейера.
+    """
+    key = make_key(EXPORT_CSV_VERSION, mart.key, csv_path)
+    return run_cached("export_to_csv", key, csv_path, lambda: write_csv(mart.path, csv_path))
+
+
+def report_cache(results):
+    hits = [r for r in results if r.hit]
+    misses = [r for r in results if not r.hit]
+    saved = sum(r.seconds for r in hits)
+    print(f"[cache] попаданий: {len(hits)}, промахов: {len(misses)}, "
+          f"сэкономлено ~{saved:.1f} c")
+
+
+@flow
+def yelp_pipeline(path: str):
+    """
+    Главный flow (аналог DAG в Airflow):
+    check_file → spark_mart → export_to_csv
+    """
+    src = check_file(path)
+    mart_parquet = spark_mart(src)
+    csv_file = export_to_csv(mart_parquet)
+    report_cache([mart_parquet, csv_file])
+    return csv_file.path
@@ -1,4 +1,7 @@
+import sys
+
 from search_engine.demo import run_demo
 
 if __name__ == "__main__":
-    run_demo()
+    # Необязательный аргумент — каталог для индексов и search.db
+    run_demo(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,182 @@
+"""
+Ранжирование BM25 с векторными операциями NumPy.
+
+При построении индекса заранее считаются idf термов и нормировки длины
+документов, postings хранятся массивами (номера документов, tf).
+Запрос: вклад каждого терма прибавляется к плотному массиву score сразу
+для всех его документов, top-k — через np.partition без полной сортировки.
+
+Индекс устроен как BM25F: у документа может быть несколько полей (заголовок,
+текст, ...) со своим весом и параметром b; tf полей нормируются и
+складываются до насыщения k1. Обычный BM25 — одно поле "body".
+"""
+from dataclasses import dataclass, field
+from math import log
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .index import InvertedIndex, build_inverted_index
+from .parser import Document
+from .search import tokenize_query
+
+K1 = 1.2
+B = 0.75
+
+
+@dataclass
+class FieldPostings:
+    """Postings терма в одном поле: номера документов и tf (NumPy)."""
+    docs: np.ndarray
+    tfs: np.ndarray
+
+
+@dataclass
+class BM25Field:
+    """
+    Поле документа. inv_norm[d] = weight / (1 - b + b * len[d] / avg_len) —
+    считается один раз, при запросе tf просто домножается на неё.
+    """
+    weight: float
+    b: float
+    lengths: np.ndarray
+    inv_norm: np.ndarray
+    postings: Dict[str, FieldPostings]
+
+
+@dataclass
+class BM25Index:
+    doc_ids: List[str]
+    k1: float = K1
+    fields: Dict[str, BM25Field] = field(default_factory=dict)
+    df: Dict[str, int] = field(default_factory=dict)
+    idf: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.doc_ids)
+
+    def add_field(
+            self,
+            name: str,
+            inverted: InvertedIndex,
+            lengths: Dict[str, int],
+            weight: float = 1.0,
+            b: float = B
+    ) -> None:
+        """
+        Добавляет поле из инвертированного индекса и длин документов в нём
+        (doc_id из self.doc_ids) и пересчитывает df/idf по всем полям.
+        """
+        doc_num = {doc_id: i for i, doc_id in enumerate(self.doc_ids)}
+
+        length_arr = np.zeros(self.num_docs, dtype=np.float64)
+        for doc_id, n in lengths.items():
+            length_arr[doc_num[doc_id]] = n
+        avg_len = float(length_arr.mean()) if self.num_docs else 0.0
+        if avg_len <= 0:
+            avg_len = 1.0
+        inv_norm = weight / (1.0 - b + b * length_arr / avg_len)
+
+        postings: Dict[str, FieldPostings] = {}
+        for term, term_postings in inverted.items():
+            docs = np.fromiter((doc_num[d] for d in term_postings), dtype=np.int64,
+                               count=len(term_postings))
+            tfs = np.fromiter(term_postings.values(), dtype=np.float64, count=len(term_postings))
+            order = np.argsort(docs)
+            postings[term] = FieldPostings(docs=docs[order], tfs=tfs[order])
+
+        self.fields[name] = BM25Field(weight, b, length_arr, inv_norm, postings)
+        self._update_idf()
+
+    def _update_idf(self) -> None:
+        """df — число документов, где терм есть хотя бы в одном поле."""
+        terms = set()
+        for f in self.fields.values():
+            terms.update(f.postings)
+
+        n = self.num_docs
+        for term in terms:
+            lists = [f.postings[term].docs for f in self.fields.values() if term in f.postings]
+            df = len(lists[0]) if len(lists) == 1 else len(np.unique(np.concatenate(lists)))
+            self.df[term] = df
+            # Вариант Lucene: +1 под логарифмом, idf всегда положительный
+            self.idf[term] = log(1.0 + (n - df + 0.5) / (df + 0.5))
+
+
+def build_bm25_index(
+        docs: Dict[str, Document],
+        inverted: Optional[InvertedIndex] = None,
+        k1: float = K1,
+        b: float = B
+) -> BM25Index:
+    """BM25-индекс с одним полем "body" по токенам документов."""
+    if inverted is None:
+        inverted = build_inverted_index(docs)
+
+    index = BM25Index(doc_ids=sorted(docs), k1=k1)
+    lengths = {doc_id: len(doc.tokens) for doc_id, doc in docs.items()}
+    index.add_field("body", inverted, lengths, weight=1.0, b=b)
+    return index
+
+
+def bm25_scores(index: BM25Index, terms: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Плотный массив score по всем документам и маска документов,
+    в которых встретился хотя бы один терм запроса.
+    """
+    n = index.num_docs
+    k1 = index.k1
+    scores = np.zeros(n, dtype=np.float64)
+    matched = np.zeros(n, dtype=bool)
+
+    for term in terms:
+        term_idf = index.idf.get(term)
+        if term_idf is None:
+            continue
+
+        parts = [(f.postings[term], f.inv_norm) for f in index.fields.values()
+                 if term in f.postings]
+        if len(parts) == 1:
+            plist, inv_norm = parts[0]
+            docs = plist.docs
+            tf_norm = plist.tfs * inv_norm[docs]
+        else:
+            # BM25F: нормированные tf полей складываются до насыщения
+            acc = np.zeros(n, dtype=np.float64)
+            for plist, inv_norm in parts:
+                acc[plist.docs] += plist.tfs * inv_norm[plist.docs]
+            docs = np.unique(np.concatenate([plist.docs for plist, _ in parts]))
+            tf_norm = acc[docs]
+
+        scores[docs] += term_idf * tf_norm * (k1 + 1.0) / (tf_norm + k1)
+        matched[docs] = True
+
+    return scores, matched
+
+
+def bm25_search(
+        query: str,
+        index: BM25Index,
+        top_k: Optional[int] = 10
+) -> List[Tuple[str, float]]:
+    """
+    Top-k документов по BM25. Кандидаты — документы хотя бы с одним термом;
+    np.partition находит k-й score за O(n), сортируются только лучшие
+    (при равных score — по doc_id, как в taat_search/daat_search).
+    """
+    scores, matched = bm25_scores(index, tokenize_query(query))
+    candidates = np.flatnonzero(matched)
+
+    if top_k is not None and len(candidates) > top_k:
+        if top_k <= 0:
+            return []
+        # k-й по величине score; равные ему берём все, чтобы порядок при
+        # равенстве решал doc_id, а не порядок после partition
+        kth = -np.partition(-scores[candidates], top_k - 1)[top_k - 1]
+        candidates = candidates[scores[candidates] >= kth]
+
+    # Номера документов идут в порядке doc_id: lexsort по (номер, -score)
+    order = np.lexsort((candidates, -scores[candidates]))[:top_k]
+    doc_ids = index.doc_ids
+    return [(doc_ids[d], float(scores[d])) for d in candidates[order]]
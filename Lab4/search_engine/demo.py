@@ -1,20 +1,47 @@
-from typing import Dict
-
-from .parser import parse_corpus, Document
-from .index import build_inverted_index, compute_idf, pretty_print_index
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+from .parser import parse_corpus, iter_corpus, available_backend, Document, FileTimings
+from .index import build_inverted_index, build_sorted_index, compute_idf, pretty_print_index
+from .bm25 import build_bm25_index, bm25_search
+from .disk_index import DiskIndex, write_disk_index
+from .segments import SegmentedIndex
+from .spimi import build_index_spimi
 from .pagerank import build_graph, pagerank_mapreduce, pagerank_pregel
 from .search import taat_search, daat_search, apply_pagerank_boost
 from .storage import init_db, save_corpus_to_db
 
 
-def run_demo():
+def run_demo(out_dir: Optional[str] = None):
+    """
+    out_dir — куда писать индексы (index_data, index_spimi, segments_data)
+    и search.db; по умолчанию — временный каталог, удаляемый после демо,
+    чтобы запуск не менял рабочую копию.
+    """
+    if out_dir is None:
+        with tempfile.TemporaryDirectory(prefix="search_demo_") as tmp:
+            _run_demo(Path(tmp))
+    else:
+        os.makedirs(out_dir, exist_ok=True)
+        _run_demo(Path(out_dir))
+
+
+def _run_demo(out_dir: Path):
     print("=== Мини-поисковик (ЛР4) ===")
 
     # 1. Парсим коллекцию документов
     data_dir = "data"
-    docs: Dict[str, Document] = parse_corpus(data_dir)
-    print(f"Загружено документов: {len(docs)}")
+    timings: FileTimings = {}
+    docs: Dict[str, Document] = parse_corpus(
+        data_dir, workers=os.cpu_count() or 1, timings=timings
+    )
+    print(f"Загружено документов: {len(docs)} (парсер: {available_backend()})")
     print("Документы:", ", ".join(sorted(docs.keys())))
+    for name, timing in sorted(timings.items()):
+        stages = ", ".join(f"{stage}={sec * 1000:.1f} мс" for stage, sec in timing.items())
+        print(f"  {name}: {stages}")
     print()
 
     # 2. Строим инвертированный индекс
@@ -26,11 +53,25 @@ def run_demo():
     pretty_print_index({k: inverted[k] for k in list(inverted.keys())[:10]})
     print()
 
+    # Сохраняем индекс на диск (varbyte + skip-указатели) и открываем через mmap
+    index_dir = out_dir / "index_data"
+    write_disk_index(inverted, str(index_dir))
+    disk_index = DiskIndex(str(index_dir))
+    print(f"Индекс на диске: {index_dir}/, термов: {len(disk_index)}")
+
+    # Тот же индекс во внешней памяти: документы потоком, блоки по 1 МБ
+    stats = build_index_spimi(iter_corpus(data_dir), str(out_dir / "index_spimi"),
+                              memory_budget=1 << 20)
+    print(f"SPIMI: документов {stats['docs']}, термов {stats['terms']}, "
+          f"прогонов {stats['runs']}, пик блока ~{stats['peak_block_bytes'] / 1024:.0f} КБ")
+    print()
+
     # 3. Строим граф ссылок и считаем PageRank (MapReduce-style)
     graph = build_graph(docs)
-    print("Инициализирую и заполняю базу данных SQLite (search.db)...")
-    init_db()
-    save_corpus_to_db(docs, inverted, graph)
+    db_path = out_dir / "search.db"
+    print(f"Инициализирую и заполняю базу данных SQLite ({db_path})...")
+    init_db(db_path)
+    save_corpus_to_db(docs, inverted, graph, db_path)
     print("База данных заполнена.\n")
 
     pr_mr = pagerank_mapreduce(graph, num_iters=10, d=0.85)
@@ -73,6 +114,42 @@ def run_demo():
         print(f"  {doc_id}: score={score:.4f}")
     print()
 
+    # BM25: учитывает длину документа, score считается векторно (NumPy)
+    print("=== Поиск (BM25, top-10) ===")
+    bm25_index = build_bm25_index(docs, inverted)
+    for doc_id, score in bm25_search(query, bm25_index, top_k=10):
+        print(f"  {doc_id}: score={score:.4f}")
+    print()
+
+    # DAAT top-k с отсечением WAND по индексу с заранее отсортированными postings
+    print("=== Поиск (DAAT top-3, WAND) ===")
+    sorted_index = build_sorted_index(inverted)
+    wand_stats: Dict[str, int] = {}
+    for doc_id, score in daat_search(query, sorted_index, idf, num_docs, top_k=3, stats=wand_stats):
+        print(f"  {doc_id}: score={score:.4f}")
+    print(f"  postings: всего {wand_stats['postings_total']}, "
+          f"пропущено {wand_stats['postings_skipped']}")
+    print()
+
+    # Тот же TAAT, но postings читаются из индекса на диске
+    print("=== Поиск (TAAT по индексу на диске) ===")
+    disk_results = taat_search(query, disk_index, idf, num_docs)
+    for doc_id, score in disk_results[:10]:
+        print(f"  {doc_id}: score={score:.4f}")
+    print()
+    disk_index.close()
+
+    # Инкрементальный индекс: документы добавляются по одному, сегменты сливаются
+    print("=== Поиск (TAAT по сегментному индексу) ===")
+    with SegmentedIndex(str(out_dir / "segments_data"), flush_docs=1, merge_factor=2) as segmented:
+        for doc in docs.values():
+            segmented.add_document(doc)
+        segmented.wait_for_merges()
+        for doc_id, score in segmented.search(query)[:10]:
+            print(f"  {doc_id}: score={score:.4f}")
+        print(f"  сегментов: {len(segmented.segments)}, документов: {segmented.num_docs}")
+    print()
+
     # Комбинация с PageRank (MapReduce)
     print("=== Поиск (TAAT + PageRank MapReduce, комбинированный скор) ===")
     boosted_results = apply_pagerank_boost(taat_results, pr_mr, alpha=0.8)
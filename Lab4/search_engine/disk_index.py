@@ -0,0 +1,314 @@
+"""
+Инвертированный индекс на диске: отсортированный словарь термов и сжатые
+posting-листы, которые читаются через mmap.
+
+Файлы в каталоге индекса:
+- meta.json   — число документов, шаг skip-указателей;
+- docs.txt    — doc_id по строкам, номер строки = целый номер документа;
+- lexicon.txt — отсортированные термы: term, df, смещение и длина списка,
+                первый skip-указатель и их число;
+- postings.bin — для каждого терма пары (разность doc_id, tf) в varbyte;
+- skips.bin   — тройки uint32 (первый doc блока, смещение блока в байтах,
+                doc перед блоком) через каждые skip_interval постингов.
+
+DiskIndex.get(term) отдаёт PostingList, который ведёт себя как
+Dict[doc_id, tf] для taat_search/daat_search, но декодирует только
+postings запрошенного терма.
+"""
+import json
+import mmap
+import os
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .index import InvertedIndex
+
+SKIP_INTERVAL = 64
+
+META_FILE = "meta.json"
+DOCS_FILE = "docs.txt"
+LEXICON_FILE = "lexicon.txt"
+POSTINGS_FILE = "postings.bin"
+SKIPS_FILE = "skips.bin"
+
+
+# =========================
+#  Variable-byte кодирование
+# =========================
+
+def encode_varbyte(n: int, out: bytearray) -> None:
+    """По 7 бит на байт, старший бит выставлен у последнего байта числа."""
+    while n >= 128:
+        out.append(n & 127)
+        n >>= 7
+    out.append(n | 128)
+
+
+def decode_varbyte(buf, pos: int) -> Tuple[int, int]:
+    n = 0
+    shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        if b & 128:
+            return n | ((b & 127) << shift), pos
+        n |= b << shift
+        shift += 7
+
+
+# =========================
+#  Запись индекса
+# =========================
+
+class DiskIndexWriter:
+    """
+    Потоковая запись индекса: термы подаются в отсортированном порядке,
+    каждый со своими postings [(номер документа, tf)], в память целиком
+    индекс не собирается. doc_ids — таблица номер -> doc_id.
+    """
+
+    def __init__(self, index_dir: str, doc_ids: List[str], skip_interval: int = SKIP_INTERVAL):
+        self.path = Path(index_dir)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.skip_interval = skip_interval
+        self.num_docs = len(doc_ids)
+
+        with open(self.path / DOCS_FILE, "w", encoding="utf-8") as f:
+            for doc_id in doc_ids:
+                f.write(doc_id + "\n")
+
+        self.skips = array("I")
+        self.offset = 0
+        self.post_f = open(self.path / POSTINGS_FILE, "wb")
+        self.lex_f = open(self.path / LEXICON_FILE, "w", encoding="utf-8")
+
+    def add(self, term: str, postings: List[Tuple[int, int]]) -> None:
+        """postings должны быть отсортированы по номеру документа."""
+        buf = bytearray()
+        skip_start = len(self.skips) // 3
+        prev = 0
+        for i, (doc, tf) in enumerate(postings):
+            if i % self.skip_interval == 0 and i > 0:
+                self.skips.extend((doc, len(buf), prev))
+            encode_varbyte(doc - prev, buf)
+            encode_varbyte(tf, buf)
+            prev = doc
+
+        self.post_f.write(buf)
+        skip_count = len(self.skips) // 3 - skip_start
+        self.lex_f.write(f"{term}\t{len(postings)}\t{self.offset}\t{len(buf)}\t"
+                         f"{skip_start}\t{skip_count}\n")
+        self.offset += len(buf)
+
+    def close(self) -> None:
+        self.post_f.close()
+        self.lex_f.close()
+
+        with open(self.path / SKIPS_FILE, "wb") as f:
+            self.skips.tofile(f)
+
+        with open(self.path / META_FILE, "w", encoding="utf-8") as f:
+            json.dump({"num_docs": self.num_docs, "skip_interval": self.skip_interval}, f)
+
+
+def write_disk_index(
+        inverted: InvertedIndex,
+        index_dir: str,
+        skip_interval: int = SKIP_INTERVAL
+) -> None:
+    """
+    Сохраняет инвертированный индекс в index_dir. Документам присваиваются
+    целые номера в порядке сортировки doc_id, поэтому порядок postings по
+    номеру совпадает с порядком по строковому doc_id (как ждёт daat_search).
+    """
+    doc_ids = sorted({doc_id for postings in inverted.values() for doc_id in postings})
+    doc_num = {doc_id: i for i, doc_id in enumerate(doc_ids)}
+
+    writer = DiskIndexWriter(index_dir, doc_ids, skip_interval)
+    for term in sorted(inverted):
+        writer.add(term, sorted((doc_num[doc_id], tf) for doc_id, tf in inverted[term].items()))
+    writer.close()
+
+
+# =========================
+#  Чтение индекса
+# =========================
+
+def _mmap_file(path: Path):
+    """mmap только для чтения; для пустого файла mmap невозможен."""
+    if os.path.getsize(path) == 0:
+        return None, b""
+    f = open(path, "rb")
+    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    f.close()
+    return mm, mm
+
+
+class PostingCursor:
+    """
+    Курсор по posting-листу в порядке номеров документов:
+    doc/tf — текущий постинг (doc=None в конце), next() — следующий,
+    seek(target) — первый постинг с doc >= target, блоки пропускаются
+    по skip-указателям без декодирования.
+    """
+
+    def __init__(self, plist: "PostingList"):
+        self.plist = plist
+        self.pos = plist.start
+        self.end = plist.start + plist.length
+        self.prev = 0
+        self.doc: Optional[int] = None
+        self.tf = 0
+        self.next()
+
+    def next(self) -> Optional[int]:
+        if self.pos >= self.end:
+            self.doc = None
+            return None
+        buf = self.plist.index.postings
+        gap, self.pos = decode_varbyte(buf, self.pos)
+        self.tf, self.pos = decode_varbyte(buf, self.pos)
+        self.prev += gap
+        self.doc = self.prev
+        return self.doc
+
+    def seek(self, target: int) -> Optional[int]:
+        if self.doc is None or self.doc >= target:
+            return self.doc
+
+        skips = self.plist.index.skips
+        # Последний блок, первый doc которого <= target
+        lo = self.plist.skip_start
+        hi = lo + self.plist.skip_count
+        first = lo
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if skips[3 * mid] <= target:
+                lo = mid + 1
+            else:
+                hi = mid
+        block = lo - 1
+        # Прыгаем, только если блок начинается дальше текущего постинга
+        if block >= first and skips[3 * block] > self.doc:
+            self.pos = self.plist.start + skips[3 * block + 1]
+            self.prev = skips[3 * block + 2]
+            self.next()
+
+        while self.doc is not None and self.doc < target:
+            self.next()
+        return self.doc
+
+
+class PostingList:
+    """Postings одного терма; интерфейс как у Dict[doc_id, tf] (len, items)."""
+
+    def __init__(self, index: "DiskIndex", df: int, start: int, length: int,
+                 skip_start: int, skip_count: int):
+        self.index = index
+        self.df = df
+        self.start = start
+        self.length = length
+        self.skip_start = skip_start
+        self.skip_count = skip_count
+
+    def __len__(self) -> int:
+        return self.df
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        """Пары (номер документа, tf)."""
+        cursor = self.cursor()
+        while cursor.doc is not None:
+            yield cursor.doc, cursor.tf
+            cursor.next()
+
+    def cursor(self) -> PostingCursor:
+        return PostingCursor(self)
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        doc_ids = self.index.doc_ids
+        for doc, tf in self:
+            yield doc_ids[doc], tf
+
+    def to_dict(self) -> Dict[str, int]:
+        return dict(self.items())
+
+
+class DiskIndex:
+    """
+    Индекс, открытый из каталога write_disk_index. Словарь термов загружается
+    в отсортированный список (поиск — bisect), postings и skip-указатели
+    остаются в файлах и читаются через mmap.
+    """
+
+    def __init__(self, index_dir: str):
+        path = Path(index_dir)
+
+        with open(path / META_FILE, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.num_docs: int = meta["num_docs"]
+        self.skip_interval: int = meta["skip_interval"]
+
+        with open(path / DOCS_FILE, "r", encoding="utf-8") as f:
+            self.doc_ids: List[str] = f.read().splitlines()
+
+        self.terms: List[str] = []
+        self.entries = array("Q")
+        with open(path / LEXICON_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                term, *fields = line.rstrip("\n").split("\t")
+                self.terms.append(term)
+                self.entries.extend(int(x) for x in fields)
+
+        self._postings_mm, self.postings = _mmap_file(path / POSTINGS_FILE)
+        self._skips_mm, skips = _mmap_file(path / SKIPS_FILE)
+        self.skips = memoryview(skips).cast("I")
+
+    def close(self) -> None:
+        self.skips.release()
+        for mm in (self._postings_mm, self._skips_mm):
+            if mm is not None:
+                mm.close()
+
+    def __enter__(self) -> "DiskIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def _find(self, term: str) -> int:
+        i = bisect_left(self.terms, term)
+        if i < len(self.terms) and self.terms[i] == term:
+            return i
+        return -1
+
+    def __contains__(self, term: str) -> bool:
+        return self._find(term) >= 0
+
+    def _posting_list(self, i: int) -> PostingList:
+        df, start, length, skip_start, skip_count = self.entries[5 * i:5 * i + 5]
+        return PostingList(self, df, start, length, skip_start, skip_count)
+
+    def get(self, term: str, default=None):
+        i = self._find(term)
+        if i < 0:
+            return default
+        return self._posting_list(i)
+
+    def __getitem__(self, term: str) -> PostingList:
+        plist = self.get(term)
+        if plist is None:
+            raise KeyError(term)
+        return plist
+
+    def keys(self) -> List[str]:
+        return self.terms
+
+    def items(self) -> Iterator[Tuple[str, PostingList]]:
+        """Пары (term, PostingList); df известен без декодирования (compute_idf)."""
+        for i, term in enumerate(self.terms):
+            yield term, self._posting_list(i)
@@ -1,4 +1,7 @@
-from typing import Dict, List, Tuple
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
 from math import log
 
 from .parser import Document
@@ -10,11 +13,10 @@ def build_inverted_index(docs: Dict[str, Document]) -> InvertedIndex:
     inverted: InvertedIndex = {}
 
     for doc_id, doc in docs.items():
-        tf: Dict[str, int] = {}
-        for w in doc.words:
-            tf[w] = tf.get(w, 0) + 1
-
-        for term, freq in tf.items():
+        # tf считаем по целым term_id, в строку терм переводим один раз
+        terms = doc.vocab.terms
+        for term_id, freq in Counter(doc.tokens).items():
+            term = terms[term_id]
             if term not in inverted:
                 inverted[term] = {}
             inverted[term][doc_id] = freq
@@ -22,6 +24,56 @@ def build_inverted_index(docs: Dict[str, Document]) -> InvertedIndex:
     return inverted
 
 
+@dataclass
+class SortedPostings:
+    """
+    Postings терма, отсортированные по целому номеру документа один раз
+    при построении индекса. max_tf — для верхней оценки вклада терма (WAND).
+    """
+    docs: array
+    tfs: array
+    max_tf: int
+    doc_ids: List[str]
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        doc_ids = self.doc_ids
+        for doc, tf in zip(self.docs, self.tfs):
+            yield doc_ids[doc], tf
+
+
+@dataclass
+class SortedIndex:
+    """Индекс с номерами документов в порядке сортировки doc_id."""
+    doc_ids: List[str]
+    postings: Dict[str, SortedPostings]
+
+    def get(self, term: str, default=None) -> Optional[SortedPostings]:
+        return self.postings.get(term, default)
+
+    def items(self) -> Iterator[Tuple[str, SortedPostings]]:
+        return iter(self.postings.items())
+
+
+def build_sorted_index(inverted: InvertedIndex) -> SortedIndex:
+    doc_ids = sorted({doc_id for postings in inverted.values() for doc_id in postings})
+    doc_num = {doc_id: i for i, doc_id in enumerate(doc_ids)}
+
+    postings: Dict[str, SortedPostings] = {}
+    for term, term_postings in inverted.items():
+        pairs = sorted((doc_num[doc_id], tf) for doc_id, tf in term_postings.items())
+        postings[term] = SortedPostings(
+            docs=array("I", [doc for doc, _ in pairs]),
+            tfs=array("I", [tf for _, tf in pairs]),
+            max_tf=max((tf for _, tf in pairs), default=0),
+            doc_ids=doc_ids
+        )
+
+    return SortedIndex(doc_ids=doc_ids, postings=postings)
+
+
 def compute_idf(inverted: InvertedIndex, num_docs: int) -> Dict[str, float]:
     idf: Dict[str, float] = {}
     for term, postings in inverted.items():
@@ -1,37 +1,160 @@
 import os
 import re
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from dataclasses import dataclass
-from typing import List, Dict
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
 
 from bs4 import BeautifulSoup
 
 WORD_RE = re.compile(r"\w+", re.UNICODE)
 
+# Бэкенды BeautifulSoup по убыванию скорости; html.parser есть всегда
+PARSER_BACKENDS = ("lxml", "html.parser")
+
+# По умолчанию — html.parser: lxml иначе разбирает битый HTML, и индекс
+# зависел бы от того, что установлено. lxml — только явно ("lxml" или "auto")
+DEFAULT_BACKEND = "html.parser"
+
+FileTimings = Dict[str, Dict[str, float]]
+
+
+class Vocabulary:
+    """
+    Словарь термов: каждый терм хранится один раз, документы ссылаются
+    на него целым term_id.
+    """
+    __slots__ = ("ids", "terms")
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.terms: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def intern(self, term: str) -> int:
+        term_id = self.ids.get(term)
+        if term_id is None:
+            term_id = len(self.terms)
+            self.ids[term] = term_id
+            self.terms.append(term)
+        return term_id
+
+    def encode(self, words: Iterable[str]) -> array:
+        return array("I", map(self.intern, words))
+
 
-@dataclass
 class Document:
-    doc_id: str
-    text: str
-    words: List[str]
-    out_links: List[str]
+    """
+    Документ в компактном виде: токены — array('I') из term_id общего
+    словаря vocab (4 байта на слово вместо str в списке). Полный текст
+    хранится, только если keep_text=True, иначе по требованию
+    перечитывается из path.
+    """
+    __slots__ = ("doc_id", "tokens", "out_links", "vocab", "path", "backend", "_text")
+
+    def __init__(
+            self,
+            doc_id: str,
+            tokens: array,
+            out_links: List[str],
+            vocab: Vocabulary,
+            path: Optional[Path] = None,
+            backend: str = "html.parser",
+            text: Optional[str] = None
+    ):
+        self.doc_id = doc_id
+        self.tokens = tokens
+        self.out_links = out_links
+        self.vocab = vocab
+        self.path = path
+        self.backend = backend
+        self._text = text
+
+    def __repr__(self) -> str:
+        return (f"Document(doc_id={self.doc_id!r}, tokens={len(self.tokens)}, "
+                f"out_links={self.out_links!r})")
+
+    @property
+    def words(self) -> List[str]:
+        terms = self.vocab.terms
+        return [terms[term_id] for term_id in self.tokens]
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            if self.path is None:
+                raise ValueError(f"Текст документа {self.doc_id} не сохранён")
+            return load_text(self.path, self.backend)
+        return self._text
+
+    def rebind(self, vocab: Vocabulary) -> None:
+        """Перекодирует токены в общий словарь (после разбора в другом процессе)."""
+        if vocab is self.vocab:
+            return
+        mapping = [vocab.intern(term) for term in self.vocab.terms]
+        self.tokens = array("I", [mapping[term_id] for term_id in self.tokens])
+        self.vocab = vocab
+
+
+def available_backend(backend: Optional[str] = DEFAULT_BACKEND) -> str:
+    """
+    Выбирает парсер для BeautifulSoup: запрошенный backend, если он
+    установлен, иначе html.parser. "auto" — самый быстрый из установленных
+    PARSER_BACKENDS (lxml); None — DEFAULT_BACKEND.
+    """
+    if backend is None:
+        backend = DEFAULT_BACKEND
+    candidates = list(PARSER_BACKENDS) if backend == "auto" else [backend]
+    for name in candidates:
+        if name == "html.parser":
+            return name
+        try:
+            __import__(name)
+            return name
+        except ImportError:
+            continue
+    return "html.parser"
 
 
-def parse_html_document(path: Path, url_map: Dict[str, str]) -> Document:
+def load_text(path: Path, backend: str = "html.parser") -> str:
+    """Текст документа с диска (для ленивой загрузки Document.text)."""
+    raw = path.read_text(encoding="utf-8")
+    if path.name.endswith(".html"):
+        return BeautifulSoup(raw, backend).get_text(separator=" ")
+    return raw
+
+
+def parse_html_document(
+        path: Path,
+        url_map: Dict[str, str],
+        backend: str = "html.parser",
+        timing: Optional[Dict[str, float]] = None,
+        vocab: Optional[Vocabulary] = None,
+        keep_text: bool = False
+) -> Document:
     """
     Парсим реальный HTML:
     - вытаскиваем текст
     - вытаскиваем ссылки <a href="...">
     - оставляем только те ссылки, которые ведут на наши же документы
+    Если передан timing, в него пишется время стадий read/parse/extract.
+    Без vocab токены кодируются в собственный словарь документа.
     """
+    vocab = vocab if vocab is not None else Vocabulary()
+    t0 = time.perf_counter()
     doc_id = path.stem
     html = path.read_text(encoding="utf-8")
+    t1 = time.perf_counter()
 
-    soup = BeautifulSoup(html, "html.parser")
+    soup = BeautifulSoup(html, backend)
+    t2 = time.perf_counter()
 
     text = soup.get_text(separator=" ")
 
-    words = [w.lower() for w in WORD_RE.findall(text)]
+    tokens = vocab.encode(w.lower() for w in WORD_RE.findall(text))
 
     hrefs = [a.get("href") for a in soup.find_all("a") if a.get("href")]
 
@@ -42,57 +165,159 @@ def parse_html_document(path: Path, url_map: Dict[str, str]) -> Document:
         if href in reverse_url_map:
             out_links.append(reverse_url_map[href])
 
+    if timing is not None:
+        timing["read"] = t1 - t0
+        timing["parse"] = t2 - t1
+        timing["extract"] = time.perf_counter() - t2
+
     return Document(
         doc_id=doc_id,
-        text=text,
-        words=words,
-        out_links=out_links
+        tokens=tokens,
+        out_links=out_links,
+        vocab=vocab,
+        path=path,
+        backend=backend,
+        text=text if keep_text else None
     )
 
 
-def parse_txt_document(path: Path) -> Document:
+def parse_txt_document(
+        path: Path,
+        timing: Optional[Dict[str, float]] = None,
+        vocab: Optional[Vocabulary] = None,
+        keep_text: bool = False
+) -> Document:
     """
     Старый вариант для .txt с [link:docX] — можешь оставить,
     если хочешь использовать и текстовые файлы.
     """
     LINK_RE = re.compile(r"\[link:(\w+)\]")
+    vocab = vocab if vocab is not None else Vocabulary()
+    backend = "html.parser"
+    t0 = time.perf_counter()
     doc_id = path.stem
     text = path.read_text(encoding="utf-8")
+    t1 = time.perf_counter()
 
-    words = [w.lower() for w in WORD_RE.findall(text)]
+    tokens = vocab.encode(w.lower() for w in WORD_RE.findall(text))
     out_links = LINK_RE.findall(text)
 
+    if timing is not None:
+        timing["read"] = t1 - t0
+        timing["parse"] = 0.0
+        timing["extract"] = time.perf_counter() - t1
+
     return Document(
         doc_id=doc_id,
-        text=text,
-        words=words,
-        out_links=out_links
+        tokens=tokens,
+        out_links=out_links,
+        vocab=vocab,
+        path=path,
+        backend=backend,
+        text=text if keep_text else None
     )
 
 
-def parse_corpus(data_dir: str) -> Dict[str, Document]:
+URL_MAP = {
+    "doc1": "https://ru.wikipedia.org/wiki/Парусный_спорт",
+    "doc2": "https://ru.wikipedia.org/wiki/Яхта",
+    "doc3": "https://ru.wikipedia.org/wiki/Регата",
+    "doc4": "https://ru.wikipedia.org/wiki/Ветер",
+}
+
+
+def parse_file(
+        path: Path,
+        url_map: Dict[str, str],
+        backend: str,
+        vocab: Optional[Vocabulary] = None,
+        keep_text: bool = False
+) -> Optional[Tuple[Document, Dict[str, float]]]:
+    """
+    Разбирает один файл корпуса по расширению; None для прочих файлов.
+    Функция верхнего уровня, чтобы её можно было отдать в пул процессов.
+    """
+    timing: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    if path.name.endswith(".html"):
+        doc = parse_html_document(path, url_map, backend, timing, vocab, keep_text)
+    elif path.name.endswith(".txt"):
+        doc = parse_txt_document(path, timing, vocab, keep_text)
+    else:
+        return None
+    timing["total"] = time.perf_counter() - t0
+    return doc, timing
+
+
+def corpus_paths(data_dir: str) -> List[Path]:
+    data_path = Path(data_dir)
+    return [data_path / name for name in sorted(os.listdir(data_path))
+            if name.endswith((".html", ".txt"))]
+
+
+def iter_corpus(
+        data_dir: str,
+        backend: str = DEFAULT_BACKEND,
+        timings: Optional[FileTimings] = None,
+        keep_text: bool = False
+) -> Iterator[Document]:
+    """
+    Разбирает файлы data_dir по одному и отдаёт документы потоком — для
+    построения индекса, когда весь корпус в память не помещается.
+    У каждого документа свой маленький словарь (общий словарь рос бы
+    вместе с корпусом).
+    """
+    backend = available_backend(backend)
+    for path in corpus_paths(data_dir):
+        doc, timing = parse_file(path, URL_MAP, backend, None, keep_text)
+        if timings is not None:
+            timings[path.name] = timing
+        yield doc
+
+
+def parse_corpus(
+        data_dir: str,
+        workers: int = 1,
+        backend: str = DEFAULT_BACKEND,
+        timings: Optional[FileTimings] = None,
+        vocab: Optional[Vocabulary] = None,
+        keep_text: bool = False
+) -> Dict[str, Document]:
     """
     Читает все .html и .txt из data_dir и возвращает dict doc_id -> Document.
     Для .html используем карту doc_id -> url.
+
+    workers > 1 — файлы разбираются в пуле процессов (результат тот же).
+    backend — парсер BeautifulSoup: "html.parser" (по умолчанию), "lxml" или
+    "auto" (самый быстрый из установленных). Если передан timings, в него
+    записывается время стадий по каждому файлу: имя -> {read, parse, extract, total}.
+
+    Все документы кодируются в общий словарь vocab (новый, если не передан;
+    доступен как doc.vocab). keep_text=False — текст не держим в памяти.
     """
-    data_path = Path(data_dir)
     docs: Dict[str, Document] = {}
+    backend = available_backend(backend)
+    vocab = vocab if vocab is not None else Vocabulary()
 
-    url_map = {
-        "doc1": "https://ru.wikipedia.org/wiki/Парусный_спорт",
-        "doc2": "https://ru.wikipedia.org/wiki/Яхта",
-        "doc3": "https://ru.wikipedia.org/wiki/Регата",
-        "doc4": "https://ru.wikipedia.org/wiki/Ветер",
-    }
-
-    for name in os.listdir(data_path):
-        path = data_path / name
-        if name.endswith(".html"):
-            doc = parse_html_document(path, url_map)
-        elif name.endswith(".txt"):
-            doc = parse_txt_document(path)
-        else:
-            continue
+    paths = corpus_paths(data_dir)
+
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+            results = list(pool.map(
+                parse_file, paths,
+                [URL_MAP] * len(paths), [backend] * len(paths),
+                [None] * len(paths), [keep_text] * len(paths),
+                chunksize=max(1, len(paths) // (workers * 4)),
+            ))
+    else:
+        results = [parse_file(path, URL_MAP, backend, vocab, keep_text) for path in paths]
+
+    for path, result in zip(paths, results):
+        doc, timing = result
+        # В пуле у каждого документа свой словарь — сводим к общему
+        doc.rebind(vocab)
         docs[doc.doc_id] = doc
+        if timings is not None:
+            timings[path.name] = timing
 
     return docs
@@ -1,7 +1,9 @@
-from typing import Dict, List, Tuple
+import heapq
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
 from math import log
 
-from .index import InvertedIndex
+from .index import InvertedIndex, SortedIndex
 from .parser import Document
 
 
@@ -41,12 +43,22 @@ def daat_search(
         query: str,
         inverted: InvertedIndex,
         idf: Dict[str, float],
-        num_docs: int
+        num_docs: int,
+        top_k: Optional[int] = None,
+        stats: Optional[Dict[str, int]] = None
 ) -> List[Tuple[str, float]]:
     """
     Document-at-a-time:
     идём по документам, объединяя отсортированные postings-списки термов.
+    С top_k и SortedIndex (build_sorted_index) — WAND: документы, которые
+    не могут попасть в top_k, пропускаются без подсчёта score; в stats
+    пишется, сколько postings пропущено.
     """
+    if top_k is not None:
+        if isinstance(inverted, SortedIndex):
+            return wand_search(query, inverted, idf, num_docs, top_k, stats)
+        return daat_search(query, inverted, idf, num_docs)[:top_k]
+
     terms = tokenize_query(query)
 
     term_postings = []
@@ -92,6 +104,92 @@ def daat_search(
     return ranked
 
 
+# Запас на погрешность округления при сравнении суммы верхних оценок с порогом
+WAND_EPS = 1e-9
+
+
+def wand_search(
+        query: str,
+        index: SortedIndex,
+        idf: Dict[str, float],
+        num_docs: int,
+        top_k: int = 10,
+        stats: Optional[Dict[str, int]] = None
+) -> List[Tuple[str, float]]:
+    """
+    Top-k DAAT с динамическим отсечением (WAND). Верхняя оценка терма —
+    max_tf * idf. Курсоры упорядочены по текущему документу; pivot — первый
+    курсор, на котором сумма оценок превышает порог (худший score в куче
+    top_k). Документы левее pivot в top_k не попадут, и курсоры перед ним
+    перепрыгивают (bisect) сразу к документу pivot.
+    Результат совпадает с daat_search(...)[:top_k], включая порядок при
+    равных score (по doc_id).
+    """
+    terms = tokenize_query(query)
+
+    # Курсор: [позиция, docs, tfs, idf терма, верхняя оценка]
+    cursors = []
+    for term in terms:
+        postings = index.get(term)
+        if not postings:
+            continue
+        term_idf = idf.get(term, log(num_docs / len(postings)))
+        cursors.append([0, postings.docs, postings.tfs, term_idf, postings.max_tf * term_idf])
+
+    total = sum(len(c[1]) for c in cursors)
+    scored = 0
+    # Мин-куча (score, -doc): при равном score хуже документ с большим номером
+    heap: List[Tuple[float, int]] = []
+
+    active = list(cursors)
+    while top_k > 0:
+        active = [c for c in active if c[0] < len(c[1])]
+        if not active:
+            break
+        active.sort(key=lambda c: c[1][c[0]])
+
+        threshold = heap[0][0] if len(heap) == top_k else None
+        pivot = None
+        upper = 0.0
+        for i, c in enumerate(active):
+            upper += c[4]
+            if threshold is None or upper > threshold - WAND_EPS * max(1.0, threshold):
+                pivot = i
+                break
+        if pivot is None:
+            break
+
+        pivot_doc = active[pivot][1][active[pivot][0]]
+        if active[0][1][active[0][0]] != pivot_doc:
+            # Документы до pivot_doc не наберут порог — перепрыгиваем
+            for c in active[:pivot]:
+                c[0] = bisect_left(c[1], pivot_doc, c[0])
+            continue
+
+        # Полный подсчёт в порядке термов запроса, как в daat_search
+        score = 0.0
+        for c in cursors:
+            pos, docs = c[0], c[1]
+            if pos < len(docs) and docs[pos] == pivot_doc:
+                score += c[2][pos] * c[3]
+                c[0] = pos + 1
+                scored += 1
+
+        entry = (score, -pivot_doc)
+        if len(heap) < top_k:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+    if stats is not None:
+        stats["postings_total"] = total
+        stats["postings_scored"] = scored
+        stats["postings_skipped"] = total - scored
+
+    doc_ids = index.doc_ids
+    return [(doc_ids[-neg_doc], score) for score, neg_doc in sorted(heap, key=lambda e: (-e[0], -e[1]))]
+
+
 def apply_pagerank_boost(
         ranked: List[Tuple[str, float]],
         pagerank: Dict[str, float],
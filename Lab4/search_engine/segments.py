@@ -0,0 +1,440 @@
+"""
+Инкрементальный индекс из сегментов (LSM-подход).
+
+- Новые и изменённые документы попадают в memtable — небольшой индекс в памяти;
+  при flush_docs документах он сбрасывается на диск неизменяемым сегментом
+  (формат disk_index).
+- Удаление документа из сегмента — tombstone (сегмент, doc_id); сам сегмент
+  не переписывается. Изменение = удаление старой версии + добавление новой.
+- Поиск опрашивает memtable и все сегменты, пропуская удалённые документы;
+  num_docs и df по корпусу обновляются при каждом добавлении и удалении
+  (термы удаляемого документа читаются из прямого индекса сегмента),
+  поэтому idf не пересчитывается с нуля.
+- Tiered merge: как только на одном уровне набирается merge_factor сегментов,
+  фоновый поток сливает их в один сегмент следующего уровня и выбрасывает
+  удалённые документы.
+
+Стоимость добавления документа зависит только от его длины (и размера
+memtable при flush), но не от размера корпуса.
+При flush, слиянии и close новые tombstones дописываются в файлы своих
+сегментов, затем manifest.json (только список сегментов) атомарно
+заменяется — объём записи не зависит от размера корпуса. df на диске не
+хранится: при открытии он суммируется по лексиконам сегментов за вычетом
+удалённых документов. memtable, как и в LSM без журнала, до flush живёт
+только в памяти.
+"""
+import json
+import os
+import shutil
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from math import log
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from .disk_index import DiskIndex, decode_varbyte, encode_varbyte, write_disk_index
+from .index import InvertedIndex
+from .parser import Document
+from .search import taat_search, tokenize_query
+
+MANIFEST_FILE = "manifest.json"
+FORWARD_FILE = "forward.bin"
+FORWARD_INDEX_FILE = "forward.idx"
+TOMBSTONES_FILE = "tombstones.txt"
+
+FLUSH_DOCS = 1000
+
+MERGE_FACTOR = 4
+
+SearchFn = Callable[..., List[Tuple[str, float]]]
+
+
+def write_forward_index(inverted: InvertedIndex, segment_dir: str) -> None:
+    """
+    Прямой индекс сегмента: для каждого документа (в порядке номеров
+    write_disk_index) номера его термов в лексиконе, разности в varbyte.
+    forward.idx — смещения uint64, документ i занимает [idx[i], idx[i+1]).
+    """
+    doc_terms: Dict[str, List[int]] = {}
+    for ordinal, term in enumerate(sorted(inverted)):
+        for doc_id in inverted[term]:
+            doc_terms.setdefault(doc_id, []).append(ordinal)
+
+    buf = bytearray()
+    offsets = array("Q", [0])
+    for doc_id in sorted(doc_terms):
+        prev = 0
+        for ordinal in doc_terms[doc_id]:
+            encode_varbyte(ordinal - prev, buf)
+            prev = ordinal
+        offsets.append(len(buf))
+
+    path = Path(segment_dir)
+    with open(path / FORWARD_FILE, "wb") as f:
+        f.write(buf)
+    with open(path / FORWARD_INDEX_FILE, "wb") as f:
+        offsets.tofile(f)
+
+
+class Segment:
+    """Неизменяемый сегмент на диске и его уровень в tiered merge."""
+
+    def __init__(self, name: str, path: Path, level: int):
+        self.name = name
+        self.path = path
+        self.level = level
+        self.index = DiskIndex(str(path))
+
+    @classmethod
+    def write(cls, inverted: InvertedIndex, name: str, path: Path, level: int) -> "Segment":
+        # Каталог мог остаться от сегмента, не попавшего в манифест до сбоя
+        shutil.rmtree(path, ignore_errors=True)
+        write_disk_index(inverted, str(path))
+        write_forward_index(inverted, str(path))
+        return cls(name, path, level)
+
+    def doc_terms(self, doc_id: str) -> List[str]:
+        """Термы документа из прямого индекса: O(длина документа), не O(сегмента)."""
+        doc_ids = self.index.doc_ids
+        num = bisect_left(doc_ids, doc_id)
+        if num == len(doc_ids) or doc_ids[num] != doc_id:
+            return []
+
+        offsets = array("Q")
+        with open(self.path / FORWARD_INDEX_FILE, "rb") as f:
+            f.seek(num * offsets.itemsize)
+            offsets.fromfile(f, 2)
+        with open(self.path / FORWARD_FILE, "rb") as f:
+            f.seek(offsets[0])
+            buf = f.read(offsets[1] - offsets[0])
+
+        terms = self.index.terms
+        result = []
+        pos = 0
+        ordinal = 0
+        while pos < len(buf):
+            gap, pos = decode_varbyte(buf, pos)
+            ordinal += gap
+            result.append(terms[ordinal])
+        return result
+
+    def read_tombstones(self) -> Set[str]:
+        path = self.path / TOMBSTONES_FILE
+        if not path.exists():
+            return set()
+        with open(path, "r", encoding="utf-8") as f:
+            return set(f.read().splitlines())
+
+    def append_tombstones(self, doc_ids: Set[str]) -> None:
+        """Дописывает только новые удаления (doc_id по строкам)."""
+        with open(self.path / TOMBSTONES_FILE, "a", encoding="utf-8") as f:
+            for doc_id in sorted(doc_ids):
+                f.write(doc_id + "\n")
+
+    def close(self) -> None:
+        self.index.close()
+
+
+class SegmentedIndex:
+    """
+    Индекс из memtable и неизменяемых сегментов. Интерфейс поиска как у
+    InvertedIndex (get(term) -> Dict[doc_id, tf]), поэтому taat_search и
+    daat_search работают с ним напрямую; search() сам подставляет idf.
+    """
+
+    def __init__(
+            self,
+            index_dir: str,
+            flush_docs: int = FLUSH_DOCS,
+            merge_factor: int = MERGE_FACTOR,
+            background_merge: bool = True
+    ):
+        self.path = Path(index_dir)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.flush_docs = flush_docs
+        self.merge_factor = merge_factor
+        self.background_merge = background_merge
+
+        self.lock = threading.RLock()
+        self.merging = False
+        self.merge_thread: Optional[threading.Thread] = None
+
+        self.segments: List[Segment] = []
+        self.tombstones: Dict[str, Set[str]] = {}
+        # Удаления, ещё не дописанные в файлы сегментов
+        self.new_tombstones: Dict[str, Set[str]] = {}
+        self.next_segment = 0
+        self.df: Counter = Counter()
+
+        # doc_id -> имя сегмента с живой версией (None — документ в memtable)
+        self.doc_location: Dict[str, Optional[str]] = {}
+
+        self.mem_postings: InvertedIndex = {}
+        self.mem_docs: Dict[str, List[str]] = {}
+
+        self._load()
+
+    # ---------- состояние на диске ----------
+
+    def _load(self) -> None:
+        manifest_path = self.path / MANIFEST_FILE
+        if not manifest_path.exists():
+            return
+
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        self.next_segment = manifest["next_segment"]
+        for entry in manifest["segments"]:
+            segment = Segment(entry["name"], self.path / entry["name"], entry["level"])
+            self.segments.append(segment)
+            deleted = segment.read_tombstones()
+            self.tombstones[segment.name] = deleted
+
+            # df терма в сегменте есть в лексиконе, postings не декодируются
+            for term, plist in segment.index.items():
+                self.df[term] += len(plist)
+            for doc_id in segment.index.doc_ids:
+                if doc_id in deleted:
+                    for term in segment.doc_terms(doc_id):
+                        self._decrement_df(term)
+                else:
+                    self.doc_location[doc_id] = segment.name
+
+    def _save(self) -> None:
+        """
+        Сначала дописывает новые tombstones в файлы сегментов, затем атомарно
+        заменяет манифест. Сбой между шагами теряет разве что новый сегмент —
+        как и memtable, — но не оставляет две живые версии документа.
+        """
+        by_name = {s.name: s for s in self.segments}
+        for name, doc_ids in self.new_tombstones.items():
+            if name in by_name and doc_ids:
+                by_name[name].append_tombstones(doc_ids)
+        self.new_tombstones = {}
+
+        manifest = {
+            "next_segment": self.next_segment,
+            "segments": [{"name": s.name, "level": s.level} for s in self.segments],
+        }
+        tmp_path = self.path / (MANIFEST_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path / MANIFEST_FILE)
+
+    def _new_segment_name(self) -> str:
+        name = f"seg_{self.next_segment:06d}"
+        self.next_segment += 1
+        return name
+
+    # ---------- статистика корпуса ----------
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.doc_location)
+
+    def idf(self, terms: List[str]) -> Dict[str, float]:
+        n = self.num_docs
+        return {t: log(n / self.df[t]) for t in terms if self.df.get(t, 0) > 0}
+
+    # ---------- изменение индекса ----------
+
+    def add_document(self, doc: Document) -> None:
+        """
+        Добавляет документ; если doc_id уже есть — заменяет старую версию.
+        Документ без термов, как и в build_inverted_index, в индекс не
+        попадает (старая версия при этом удаляется).
+        """
+        with self.lock:
+            if doc.doc_id in self.doc_location:
+                self.delete_document(doc.doc_id)
+            if not doc.tokens:
+                return
+
+            terms = doc.vocab.terms
+            tf = Counter(doc.tokens)
+            doc_terms = []
+            for term_id, freq in tf.items():
+                term = terms[term_id]
+                self.mem_postings.setdefault(term, {})[doc.doc_id] = freq
+                self.df[term] += 1
+                doc_terms.append(term)
+
+            self.mem_docs[doc.doc_id] = doc_terms
+            self.doc_location[doc.doc_id] = None
+
+            if len(self.mem_docs) >= self.flush_docs:
+                self.flush()
+
+    def delete_document(self, doc_id: str) -> bool:
+        with self.lock:
+            if doc_id not in self.doc_location:
+                return False
+
+            location = self.doc_location.pop(doc_id)
+            if location is None:
+                # Из memtable удаляем по-настоящему
+                for term in self.mem_docs.pop(doc_id):
+                    postings = self.mem_postings[term]
+                    del postings[doc_id]
+                    if not postings:
+                        del self.mem_postings[term]
+                    self._decrement_df(term)
+            else:
+                # Сегмент неизменяемый: tombstone, postings уйдут при слиянии
+                segment = next((s for s in self.segments if s.name == location), None)
+                if segment is None:
+                    return True
+                for term in segment.doc_terms(doc_id):
+                    self._decrement_df(term)
+                self.tombstones[location].add(doc_id)
+                self.new_tombstones.setdefault(location, set()).add(doc_id)
+            return True
+
+    def _decrement_df(self, term: str) -> None:
+        self.df[term] -= 1
+        if self.df[term] <= 0:
+            del self.df[term]
+
+    def flush(self) -> None:
+        """Сбрасывает memtable в новый сегмент уровня 0."""
+        with self.lock:
+            if not self.mem_docs:
+                return
+
+            name = self._new_segment_name()
+            segment = Segment.write(self.mem_postings, name, self.path / name, level=0)
+
+            self.segments.append(segment)
+            self.tombstones[name] = set()
+            for doc_id in self.mem_docs:
+                self.doc_location[doc_id] = name
+
+            self.mem_postings = {}
+            self.mem_docs = {}
+            self._save()
+
+        self.maybe_merge()
+
+    # ---------- tiered merge ----------
+
+    def _pick_merge(self) -> Optional[List[Segment]]:
+        by_level: Dict[int, List[Segment]] = {}
+        for segment in self.segments:
+            by_level.setdefault(segment.level, []).append(segment)
+        for level in sorted(by_level):
+            if len(by_level[level]) >= self.merge_factor:
+                return by_level[level][:self.merge_factor]
+        return None
+
+    def maybe_merge(self) -> None:
+        """Запускает слияние, если есть уровень с merge_factor сегментами."""
+        with self.lock:
+            if self.merging or self._pick_merge() is None:
+                return
+            self.merging = True
+            if self.background_merge:
+                self.merge_thread = threading.Thread(target=self._merge_loop, daemon=True)
+                self.merge_thread.start()
+                return
+        self._merge_loop()
+
+    def wait_for_merges(self) -> None:
+        thread = self.merge_thread
+        if thread is not None:
+            thread.join()
+
+    def _merge_loop(self) -> None:
+        while True:
+            with self.lock:
+                sources = self._pick_merge()
+                if sources is None:
+                    # Сброс флага под той же блокировкой, что и проверка: иначе
+                    # flush между ними увидел бы merging=True и слияние потерялось
+                    self.merging = False
+                    return
+                deleted = {s.name: set(self.tombstones[s.name]) for s in sources}
+                name = self._new_segment_name()
+            try:
+                self._merge(sources, deleted, name)
+            except BaseException:
+                with self.lock:
+                    self.merging = False
+                raise
+
+    def _merge(self, sources: List[Segment], deleted: Dict[str, Set[str]], name: str) -> None:
+        """
+        Сливает сегменты без блокировки (они неизменяемы), удалённые на момент
+        старта документы выбрасываются. Подмена сегментов — под блокировкой.
+        """
+        merged: InvertedIndex = {}
+        for segment in sources:
+            gone = deleted[segment.name]
+            for term, plist in segment.index.items():
+                for doc_id, tf in plist.items():
+                    if doc_id not in gone:
+                        merged.setdefault(term, {})[doc_id] = tf
+
+        level = max(s.level for s in sources) + 1
+        segment = Segment.write(merged, name, self.path / name, level)
+
+        with self.lock:
+            source_names = {s.name for s in sources}
+
+            # Удалённые во время слияния документы переносим в tombstones нового сегмента
+            late = set()
+            for s in sources:
+                late |= self.tombstones.pop(s.name) - deleted[s.name]
+                self.new_tombstones.pop(s.name, None)
+            self.tombstones[name] = late
+            self.new_tombstones[name] = set(late)
+
+            for doc_id in segment.index.doc_ids:
+                if self.doc_location.get(doc_id) in source_names:
+                    self.doc_location[doc_id] = name
+
+            position = self.segments.index(sources[0])
+            self.segments = [s for s in self.segments if s.name not in source_names]
+            self.segments.insert(min(position, len(self.segments)), segment)
+            self._save()
+
+            for s in sources:
+                s.close()
+                shutil.rmtree(s.path, ignore_errors=True)
+
+    # ---------- поиск ----------
+
+    def get(self, term: str, default=None) -> Optional[Dict[str, int]]:
+        """Живые postings терма из memtable и всех сегментов."""
+        with self.lock:
+            postings: Dict[str, int] = dict(self.mem_postings.get(term, {}))
+            for segment in self.segments:
+                plist = segment.index.get(term)
+                if plist is None:
+                    continue
+                gone = self.tombstones[segment.name]
+                for doc_id, tf in plist.items():
+                    if doc_id not in gone:
+                        postings[doc_id] = tf
+        return postings if postings else default
+
+    def search(self, query: str, method: SearchFn = taat_search) -> List[Tuple[str, float]]:
+        """taat_search/daat_search по всем сегментам с idf по всему корпусу."""
+        with self.lock:
+            return method(query, self, self.idf(tokenize_query(query)), self.num_docs)
+
+    def close(self) -> None:
+        self.flush()
+        self.wait_for_merges()
+        with self.lock:
+            self._save()
+            for segment in self.segments:
+                segment.close()
+
+    def __enter__(self) -> "SegmentedIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
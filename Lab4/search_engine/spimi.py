@@ -0,0 +1,179 @@
+"""
+Построение индекса во внешней памяти (SPIMI — single-pass in-memory indexing).
+
+Документы приходят потоком (iter_corpus), postings копятся в блоке в памяти,
+пока оценка его размера не превысит memory_budget; тогда блок сортируется
+по термам и сбрасывается на диск отдельным прогоном (run). В конце прогоны
+сливаются k-way merge и записываются в формат disk_index. Результат
+совпадает с write_disk_index(build_inverted_index(docs)).
+
+В памяти одновременно: один блок, список doc_id и по одному терму из
+каждого прогона при слиянии.
+"""
+import heapq
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+from array import array
+from collections import Counter
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .disk_index import DiskIndexWriter, SKIP_INTERVAL
+from .parser import Document
+
+MEMORY_BUDGET = 64 * 1024 * 1024
+
+# Грубая оценка памяти блока: новый терм — строка + array + слот в dict,
+# постинг — два uint32 в array (с запасом на переаллокацию)
+TERM_OVERHEAD_BYTES = 64 + 104
+POSTING_BYTES = 9
+
+# Сколько прогонов сливается за раз (открытые файлы); больше — в несколько проходов
+MERGE_FAN_IN = 64
+
+Block = Dict[str, array]
+
+
+def write_run(block: Block, path: str) -> None:
+    """Прогон: термы по возрастанию, у каждого array [номер, tf, номер, tf, ...]."""
+    with open(path, "wb") as f:
+        for term in sorted(block):
+            pickle.dump((term, block[term]), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def read_run(path: str) -> Iterator[Tuple[str, array]]:
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def _merged_terms(paths: List[str]) -> Iterator[Tuple[str, List[array]]]:
+    merged = heapq.merge(*(read_run(path) for path in paths), key=lambda item: item[0])
+    for term, group in groupby(merged, key=lambda item: item[0]):
+        yield term, [flat for _, flat in group]
+
+
+def reduce_runs(runs: List[str], run_dir: str, fan_in: int = MERGE_FAN_IN) -> List[str]:
+    """Сливает прогоны группами по fan_in, пока их не станет не больше fan_in."""
+    level = 0
+    while len(runs) > fan_in:
+        next_runs = []
+        for i in range(0, len(runs), fan_in):
+            group = runs[i:i + fan_in]
+            path = os.path.join(run_dir, f"merge_{level}_{i // fan_in:05d}.bin")
+            with open(path, "wb") as f:
+                for term, flats in _merged_terms(group):
+                    combined = array("I")
+                    for flat in flats:
+                        combined.extend(flat)
+                    pickle.dump((term, combined), f, protocol=pickle.HIGHEST_PROTOCOL)
+            for old in group:
+                os.remove(old)
+            next_runs.append(path)
+        runs = next_runs
+        level += 1
+    return runs
+
+
+def build_index_spimi(
+        docs: Iterable[Document],
+        index_dir: str,
+        memory_budget: int = MEMORY_BUDGET,
+        tmp_dir: Optional[str] = None,
+        skip_interval: int = SKIP_INTERVAL
+) -> Dict[str, int]:
+    """
+    Строит индекс в index_dir (формат disk_index, открывается DiskIndex),
+    держа в памяти ~memory_budget байт postings (бюджет проверяется после
+    каждого документа, так что блок может превысить его на один документ).
+    Возвращает статистику: docs, terms, postings, runs, peak_block_bytes,
+    memory_budget.
+    """
+    stats = Counter(memory_budget=memory_budget)
+    run_dir = tempfile.mkdtemp(prefix="spimi_", dir=tmp_dir)
+    runs: List[str] = []
+
+    # Номера документов в порядке поступления; итоговые — по сортировке doc_id
+    doc_ids: List[str] = []
+    block: Block = {}
+    block_bytes = 0
+
+    def flush_block() -> None:
+        nonlocal block, block_bytes
+        if not block:
+            return
+        path = os.path.join(run_dir, f"run_{len(runs):05d}.bin")
+        write_run(block, path)
+        runs.append(path)
+        stats["peak_block_bytes"] = max(stats["peak_block_bytes"], block_bytes)
+        block = {}
+        block_bytes = 0
+
+    try:
+        for doc in docs:
+            if not doc.tokens:
+                # Как и в build_inverted_index: без термов документ в индекс не попадает
+                continue
+            doc_num = len(doc_ids)
+            doc_ids.append(doc.doc_id)
+
+            terms = doc.vocab.terms
+            for term_id, tf in Counter(doc.tokens).items():
+                term = terms[term_id]
+                postings = block.get(term)
+                if postings is None:
+                    postings = block[term] = array("I")
+                    block_bytes += TERM_OVERHEAD_BYTES + sys.getsizeof(term)
+                postings.append(doc_num)
+                postings.append(tf)
+                block_bytes += POSTING_BYTES
+                stats["postings"] += 1
+
+            if block_bytes >= memory_budget:
+                flush_block()
+        flush_block()
+
+        stats["docs"] = len(doc_ids)
+        stats["runs"] = len(runs)
+        runs = reduce_runs(runs, run_dir)
+        stats["terms"] = merge_runs(runs, doc_ids, index_dir, skip_interval)
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    return dict(stats)
+
+
+def merge_runs(
+        runs: List[str],
+        doc_ids: List[str],
+        index_dir: str,
+        skip_interval: int = SKIP_INTERVAL
+) -> int:
+    """
+    k-way merge прогонов в DiskIndexWriter; номера документов переводятся
+    из порядка поступления в порядок сортировки doc_id. Возвращает число термов.
+    """
+    order = sorted(range(len(doc_ids)), key=doc_ids.__getitem__)
+    final_num = array("I", bytes(4 * len(doc_ids)))
+    for num, stream_num in enumerate(order):
+        final_num[stream_num] = num
+
+    writer = DiskIndexWriter(index_dir, [doc_ids[i] for i in order], skip_interval)
+    n_terms = 0
+
+    for term, flats in _merged_terms(runs):
+        postings = []
+        for flat in flats:
+            postings.extend(zip((final_num[d] for d in flat[0::2]), flat[1::2]))
+        postings.sort()
+        writer.add(term, postings)
+        n_terms += 1
+
+    writer.close()
+    return n_terms
@@ -9,12 +9,12 @@ from .pagerank import Graph
 DB_PATH = Path("search.db")
 
 
-def get_connection():
-    return sqlite3.connect(DB_PATH)
+def get_connection(db_path: Path = DB_PATH):
+    return sqlite3.connect(db_path)
 
 
-def init_db():
-    conn = get_connection()
+def init_db(db_path: Path = DB_PATH):
+    conn = get_connection(db_path)
     cur = conn.cursor()
 
     cur.execute("""
@@ -58,13 +58,14 @@ def init_db():
 def save_corpus_to_db(
         docs: Dict[str, Document],
         inverted: InvertedIndex,
-        graph: Graph
+        graph: Graph,
+        db_path: Path = DB_PATH
 ):
     """
     Записываем документы, термы, postings и ссылки в SQLite.
     Этого достаточно, чтобы честно сказать: БД документа, слов и ссылок заполнена.
     """
-    conn = get_connection()
+    conn = get_connection(db_path)
     cur = conn.cursor()
 
     doc_id_to_db_id: Dict[str, int] = {}
@@ -0,0 +1,42 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_engine.parser import Document, Vocabulary
+from search_engine.segments import SegmentedIndex
+
+
+def make_doc(vocab, doc_id, words):
+    return Document(doc_id, vocab.encode(words), [], vocab)
+
+
+def test_empty_document_survives_flush_merge_delete_and_readd(tmp_path):
+    vocab = Vocabulary()
+    index = SegmentedIndex(str(tmp_path), flush_docs=1, merge_factor=2, background_merge=False)
+
+    index.add_document(make_doc(vocab, "empty", []))
+    index.add_document(make_doc(vocab, "a", ["apple", "pie"]))
+    index.add_document(make_doc(vocab, "b", ["apple"]))
+    index.flush()
+    index.maybe_merge()
+    assert len(index.segments) == 1
+    assert index.num_docs == 2
+
+    assert not index.delete_document("empty")
+    index.add_document(make_doc(vocab, "empty", []))
+    index.add_document(make_doc(vocab, "empty", ["pie"]))
+    assert index.num_docs == 3
+    assert index.df["pie"] == 2
+
+    # Документ с термами, ставший пустым, удаляется
+    index.flush()
+    index.add_document(make_doc(vocab, "empty", []))
+    assert index.num_docs == 2
+    assert index.df["pie"] == 1
+    index.close()
+
+    reopened = SegmentedIndex(str(tmp_path), background_merge=False)
+    assert reopened.num_docs == 2
+    assert reopened.df == {"apple": 2, "pie": 1}
+    reopened.close()
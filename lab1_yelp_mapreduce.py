@@ -1,10 +1,34 @@
+import hashlib
 import json
+import os
+import sys
+from array import array
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+
+try:
+    import mapreduce_engine
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import mapreduce_engine
 
 BUSINESS_PATH = "yelp_academic_dataset_business.json"
 
 MIN_BUSINESSES_PER_CITY = 10
 
+WORKERS = os.cpu_count() or 1
+
+SPLITS_PER_WORKER = 4
+
+CACHE_SUFFIX = ".colcache"
+
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+
+CACHE_VERSION = 1
+
+HASH_SAMPLE_BYTES = 1 << 20
+
 
 def mapper(line):
     try:
@@ -49,19 +73,64 @@ def reducer(city, values):
     return city, avg, count
 
 
-def run_mapreduce(path):
-    mapped = []
+def combiner(left, right):
+    """
+    Комбайнер для значений (stars, n): складывает суммы и счётчики.
+    Операция ассоциативна, поэтому её можно применять и внутри mapper'а,
+    и при слиянии частичных состояний сплитов.
+    """
+    return left[0] + right[0], left[1] + right[1]
 
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            kv_pairs = mapper(line)
-            mapped.extend(kv_pairs)
 
-    grouped = shuffle_and_sort(mapped)
+def combine_into(state, kv_pairs, combiner=combiner):
+    """
+    In-mapper combining: сразу сворачивает пары (key, value) в state,
+    не накапливая промежуточных списков.
+    """
+    for key, value in kv_pairs:
+        if key in state:
+            state[key] = combiner(state[key], value)
+        else:
+            state[key] = value
+    return state
+
+
+def split_file(path, n_splits):
+    """
+    Делит файл на n_splits диапазонов байт [start, end), выровненных по
+    границам строк (см. mapreduce_engine.file_splits).
+    """
+    return mapreduce_engine.file_splits(path, n_splits)
+
+
+def map_split(path, start, end, mapper=mapper, combiner=combiner):
+    """
+    Map-задача для одного сплита: mapper по каждой строке диапазона и
+    частичная свёртка комбайнером в состояние city -> (sum_stars, count).
+    """
+    partial = {}
+
+    for line in mapreduce_engine.read_split_lines(path, start, end):
+        combine_into(partial, mapper(line), combiner)
+
+    return partial
+
+
+def merge_partials(partials, combiner=combiner):
+    """
+    Слияние частичных состояний сплитов. Сплиты сливаются по порядку,
+    поэтому порядок городов совпадает с порядком первого появления в файле.
+    """
+    merged = {}
+    for partial in partials:
+        combine_into(merged, partial.items(), combiner)
+    return merged
 
+
+def _collect_city_stats(groups, reducer):
     city_stats = []
 
-    for city, values in grouped.items():
+    for city, values in groups:
         result = reducer(city, values)
         if result is None:
             continue
@@ -84,8 +153,388 @@ def run_mapreduce(path):
     return best_city, best_avg, best_count, city_stats
 
 
+def run_mapreduce_parallel(path, workers=WORKERS, n_splits=None,
+                           mapper=mapper, reducer=reducer, combiner=combiner):
+    """
+    Параллельный вариант run_mapreduce: файл режется на сплиты по строкам,
+    каждый сплит обрабатывается в отдельном процессе (mapper + частичный
+    reducer), затем состояния (sum, count) сливаются и передаются в reducer.
+
+    Рейтинги в Yelp кратны 0.5, поэтому суммы считаются точно и результат
+    совпадает с последовательным запуском.
+    """
+    if n_splits is None:
+        n_splits = workers * SPLITS_PER_WORKER
+
+    splits = split_file(path, n_splits)
+
+    if workers <= 1 or len(splits) <= 1:
+        partials = [map_split(path, start, end, mapper, combiner) for start, end in splits]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(map_split, path, start, end, mapper, combiner)
+                       for start, end in splits]
+            partials = [fut.result() for fut in futures]
+
+    merged = merge_partials(partials, combiner)
+
+    return _collect_city_stats(((city, [state]) for city, state in merged.items()), reducer)
+
+
+def split_mapper(split):
+    """mapper для движка: запись — сплит (path, start, end), читаем его строки."""
+    for line in mapreduce_engine.read_split_lines(*split):
+        yield from mapper(line)
+
+
+def engine_combiner(city, values):
+    yield reduce(combiner, values)
+
+
+def engine_reducer(city, values):
+    yield city, reduce(combiner, values)
+
+
+def run_mapreduce_engine(path, executor="process", workers=WORKERS, counters=None):
+    """
+    Та же задача на общем движке mapreduce_engine: входные записи — сплиты
+    файла, combiner сворачивает (stars, n) внутри map-задачи, ключи
+    распределяются по reduce-задачам хеш-партиционированием.
+    """
+    splits = [(path, start, end) for start, end in split_file(path, workers * SPLITS_PER_WORKER)]
+
+    outputs = mapreduce_engine.run(
+        splits, split_mapper, engine_reducer,
+        combiner=engine_combiner,
+        executor=executor,
+        workers=workers,
+        counters=counters,
+    )
+
+    return _collect_city_stats(((city, [state]) for city, state in outputs), reducer)
+
+
+def run_mapreduce_streaming(path, mapper=mapper, reducer=reducer, combiner=combiner):
+    """
+    Потоковый вариант run_mapreduce: выход mapper'а сразу сворачивается
+    комбайнером в состояние по ключу, поэтому память O(число городов),
+    а не O(число заведений). Списки mapped и groups не строятся.
+    """
+    state = {}
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            combine_into(state, mapper(line), combiner)
+
+    return _collect_city_stats(((city, [value]) for city, value in state.items()), reducer)
+
+
+def prefix_sha1(path, length):
+    """
+    sha1 по первым и последним HASH_SAMPLE_BYTES байтам префикса [0, length)
+    (полный хеш многогигабайтного файла слишком дорог).
+    """
+    h = hashlib.sha1()
+
+    with open(path, "rb") as f:
+        h.update(f.read(min(length, HASH_SAMPLE_BYTES)))
+        if length > HASH_SAMPLE_BYTES:
+            f.seek(max(HASH_SAMPLE_BYTES, length - HASH_SAMPLE_BYTES))
+            h.update(f.read(length - f.tell()))
+
+    return h.hexdigest()
+
+
+def file_fingerprint(path):
+    """
+    Отпечаток исходного файла: размер, mtime и выборочный sha1 содержимого.
+    """
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": prefix_sha1(path, st.st_size)}
+
+
+def _encode(value, dictionary, codes):
+    code = codes.get(value)
+    if code is None:
+        code = len(dictionary)
+        codes[value] = code
+        dictionary.append(value)
+    return code
+
+
+def build_column_cache(path, cache_dir=None):
+    """
+    Одноразовая конвертация JSON-lines в колоночный кеш рядом с файлом:
+    city/state/categories кодируются словарём (int32-коды + *_dict.json),
+    stars/review_count хранятся как числовые колонки .npy.
+    Пропуски: код -1, stars = NaN, review_count = -1.
+    Категории хранятся как CSR: categories_offsets + categories.
+    """
+    import numpy as np
+
+    if cache_dir is None:
+        cache_dir = path + CACHE_SUFFIX
+    os.makedirs(cache_dir, exist_ok=True)
+
+    fingerprint = file_fingerprint(path)
+
+    dicts = {"city": [], "state": [], "categories": []}
+    codes = {"city": {}, "state": {}, "categories": {}}
+
+    city_col = array("i")
+    state_col = array("i")
+    stars_col = array("d")
+    review_col = array("q")
+    cat_offsets = array("q", [0])
+    cat_col = array("i")
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+            city = obj.get("city")
+            city_col.append(_encode(str(city).strip(), dicts["city"], codes["city"]) if city else -1)
+
+            state = obj.get("state")
+            state_col.append(_encode(str(state).strip(), dicts["state"], codes["state"]) if state else -1)
+
+            try:
+                stars = float(obj.get("stars"))
+            except (TypeError, ValueError):
+                stars = float("nan")
+            stars_col.append(stars)
+
+            try:
+                review_col.append(int(obj.get("review_count")))
+            except (TypeError, ValueError):
+                review_col.append(-1)
+
+            categories = obj.get("categories")
+            if categories:
+                for cat in str(categories).split(","):
+                    cat = cat.strip()
+                    if cat:
+                        cat_col.append(_encode(cat, dicts["categories"], codes["categories"]))
+            cat_offsets.append(len(cat_col))
+
+    columns = {
+        "city": np.frombuffer(city_col, dtype=np.int32),
+        "state": np.frombuffer(state_col, dtype=np.int32),
+        "stars": np.frombuffer(stars_col, dtype=np.float64),
+        "review_count": np.frombuffer(review_col, dtype=np.int64),
+        "categories_offsets": np.frombuffer(cat_offsets, dtype=np.int64),
+        "categories": np.frombuffer(cat_col, dtype=np.int32),
+    }
+    for name, column in columns.items():
+        np.save(os.path.join(cache_dir, name + ".npy"), column)
+
+    for name, dictionary in dicts.items():
+        with open(os.path.join(cache_dir, name + "_dict.json"), "w", encoding="utf-8") as f:
+            json.dump(dictionary, f, ensure_ascii=False)
+
+    # meta.json пишется последним: без него кеш считается неполным
+    meta = {"version": CACHE_VERSION, "source": fingerprint, "rows": len(city_col)}
+    with open(os.path.join(cache_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    return cache_dir
+
+
+def load_column_cache(path, cache_dir=None):
+    """
+    Открывает колоночный кеш через mmap. Возвращает None, если кеша нет,
+    он устарел (изменились размер, mtime или хеш файла) или numpy недоступен.
+    """
+    if cache_dir is None:
+        cache_dir = path + CACHE_SUFFIX
+
+    meta_path = os.path.join(cache_dir, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+
+    if meta.get("version") != CACHE_VERSION or meta.get("source") != file_fingerprint(path):
+        return None
+
+    cache = {}
+    for name in ("city", "state", "stars", "review_count", "categories_offsets", "categories"):
+        cache[name] = np.load(os.path.join(cache_dir, name + ".npy"), mmap_mode="r")
+
+    for name in ("city", "state", "categories"):
+        with open(os.path.join(cache_dir, name + "_dict.json"), "r", encoding="utf-8") as f:
+            cache[name + "_dict"] = json.load(f)
+
+    return cache
+
+
+def columnar_group_by(cache, key):
+    """
+    Векторизованный group-by по колонке key ("city", "state" или "categories")
+    для строк с валидным stars. Возвращает список (name, sum_stars, count)
+    в порядке первого появления ключа, как в потоковом MapReduce.
+    """
+    import numpy as np
+
+    stars = np.asarray(cache["stars"])
+
+    if key == "categories":
+        offsets = np.asarray(cache["categories_offsets"])
+        keys = np.asarray(cache["categories"])
+        stars = np.repeat(stars, np.diff(offsets))
+    else:
+        keys = np.asarray(cache[key])
+
+    names = cache[key + "_dict"]
+    valid = (keys >= 0) & ~np.isnan(stars)
+    keys = keys[valid]
+    stars = stars[valid]
+
+    sums = np.bincount(keys, weights=stars, minlength=len(names))
+    counts = np.bincount(keys, minlength=len(names))
+
+    first = np.full(len(names), len(keys), dtype=np.int64)
+    np.minimum.at(first, keys, np.arange(len(keys), dtype=np.int64))
+    order = np.argsort(first, kind="stable")[:np.count_nonzero(counts)]
+
+    return [(names[k], float(sums[k]), int(counts[k])) for k in order]
+
+
+def run_mapreduce_columnar(cache, reducer=reducer):
+    groups = ((city, [(sum_stars, count)]) for city, sum_stars, count in columnar_group_by(cache, "city"))
+    return _collect_city_stats(groups, reducer)
+
+
+def complete_lines_end(path, start, size):
+    """
+    Конец последней полной строки в [start, size): недописанный хвост
+    (файл в процессе дозаписи) оставляем на следующий запуск.
+    """
+    with open(path, "rb") as f:
+        pos = size
+        while pos > start:
+            chunk_start = max(start, pos - 65536)
+            f.seek(chunk_start)
+            chunk = f.read(pos - chunk_start)
+            nl = chunk.rfind(b"\n")
+            if nl >= 0:
+                return chunk_start + nl + 1
+            pos = chunk_start
+    return start
+
+
+def load_checkpoint(path, checkpoint_path=None):
+    """
+    Возвращает (offset, state) из чекпоинта, если префикс файла [0, offset)
+    не изменился, иначе (0, {}) — то есть полный пересчёт.
+    """
+    if checkpoint_path is None:
+        checkpoint_path = path + CHECKPOINT_SUFFIX
+
+    if not os.path.exists(checkpoint_path):
+        return 0, {}
+
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+
+    offset = checkpoint["offset"]
+    if offset > os.path.getsize(path) or prefix_sha1(path, offset) != checkpoint["prefix_sha1"]:
+        return 0, {}
+
+    state = {city: (sum_stars, count) for city, (sum_stars, count) in checkpoint["state"].items()}
+    return offset, state
+
+
+def save_checkpoint(path, offset, state, checkpoint_path=None):
+    if checkpoint_path is None:
+        checkpoint_path = path + CHECKPOINT_SUFFIX
+
+    checkpoint = {
+        "offset": offset,
+        "prefix_sha1": prefix_sha1(path, offset),
+        "state": state,
+    }
+
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def run_mapreduce_incremental(path, checkpoint_path=None, mapper=mapper, reducer=reducer,
+                              combiner=combiner):
+    """
+    Инкрементальный запуск для дописываемого файла: из чекпоинта берутся
+    состояние city -> (sum_stars, count) и смещение уже обработанного
+    префикса, mapper прогоняется только по новым строкам. Если отпечаток
+    префикса не совпал (файл переписан, а не дописан) — полный пересчёт.
+    """
+    offset, state = load_checkpoint(path, checkpoint_path)
+
+    end = complete_lines_end(path, offset, os.path.getsize(path))
+    if end > offset:
+        delta = map_split(path, offset, end, mapper, combiner)
+        state = merge_partials([state, delta], combiner)
+        save_checkpoint(path, end, state, checkpoint_path)
+
+    return _collect_city_stats(((city, [value]) for city, value in state.items()), reducer)
+
+
+def run_mapreduce(path, workers=1, streaming=False, use_cache=True, incremental=False,
+                  executor=None):
+    """
+    streaming=False — исходный материализующий путь (mapped + shuffle_and_sort),
+    оставлен для сравнения; streaming=True — потоковый путь с комбайнером;
+    workers > 1 — параллельный путь по сплитам.
+    Если рядом с файлом есть актуальный колоночный кеш (build_column_cache),
+    JSON не разбирается вовсе; use_cache=False отключает это.
+    incremental=True — дообработка только дописанных строк по чекпоинту.
+    executor ("serial", "thread", "process") — запуск на общем движке mapreduce_engine.
+    """
+    if executor is not None:
+        return run_mapreduce_engine(path, executor=executor, workers=workers)
+
+    if incremental:
+        return run_mapreduce_incremental(path)
+
+    if use_cache:
+        cache = load_column_cache(path)
+        if cache is not None:
+            return run_mapreduce_columnar(cache)
+
+    if workers > 1:
+        return run_mapreduce_parallel(path, workers=workers)
+
+    if streaming:
+        return run_mapreduce_streaming(path)
+
+    mapped = []
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            kv_pairs = mapper(line)
+            mapped.extend(kv_pairs)
+
+    grouped = shuffle_and_sort(mapped)
+
+    return _collect_city_stats(grouped.items(), reducer)
+
+
 def main():
-    best_city, best_avg, best_count, city_stats = run_mapreduce(BUSINESS_PATH)
+    if "--build-cache" in sys.argv[1:]:
+        print(f"Строю колоночный кеш для {BUSINESS_PATH}...")
+        print(f"Кеш сохранён в {build_column_cache(BUSINESS_PATH)}")
+
+    best_city, best_avg, best_count, city_stats = run_mapreduce(BUSINESS_PATH, workers=WORKERS)
 
     print("Город с максимальным средним рейтингом заведений "
           f"(учитываются только города с N >= {MIN_BUSINESSES_PER_CITY} заведений):")
@@ -0,0 +1,499 @@
+"""
+Общий мини-движок MapReduce для ЛР1 и ЛР2.
+
+    run(inputs, mapper, reducer, combiner=None, partitioner=None, executor="serial")
+
+- mapper(record) -> итерируемое пар (key, value);
+- combiner(key, values) -> итерируемое значений, применяется к выходу
+  каждой map-задачи отдельно (как в Hadoop), может отсутствовать;
+- partitioner(key, num_reducers) -> номер reduce-задачи (по умолчанию
+  стабильный хеш: встроенный hash() строк отличается между процессами);
+- reducer(key, values) -> итерируемое выходных записей.
+
+Исполнители: "serial", "thread", "process" или объект с методом map(fn, args).
+Порядок выхода: по reduce-задачам, внутри задачи — по первому появлению ключа.
+
+Вход без len() (генератор, например чанки с диска) не материализуется:
+последовательный исполнитель читает его одной ленивой map-задачей, пулы —
+задачами по map_task_records записей с ограниченным числом задач в полёте.
+
+С spill_threshold=N shuffle становится внешним: map-задача (spill_task_records
+входных записей) держит в памяти не больше N промежуточных записей, затем
+сортирует их по ключу и сбрасывает на диск отдельным прогоном (run) на каждую
+партицию; reduce-задача сливает прогоны k-way слиянием через кучу (не больше
+MERGE_FAN_IN файлов за раз, лишние прогоны предварительно сливаются в
+несколько проходов). Выход reducer'а тоже пишется на диск и
+возвращается как SpilledOutput, который можно подать на вход следующей
+задаче без загрузки в память. Ключи в этом режиме должны быть сравнимы.
+"""
+import heapq
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import weakref
+import zlib
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import groupby, islice
+from operator import itemgetter
+from os import cpu_count
+
+MAP_TASKS_PER_WORKER = 4
+
+MAP_TASK_RECORDS = 16
+
+# Входных записей на map-задачу во внешнем shuffle (не связано с spill_threshold)
+SPILL_TASK_RECORDS = 4096
+
+IN_FLIGHT_PER_WORKER = 2
+
+# Сколько прогонов открыто одновременно при слиянии (лимит файловых дескрипторов)
+MERGE_FAN_IN = 64
+
+
+def hash_partitioner(key, num_reducers):
+    if num_reducers == 1:
+        return 0
+    if isinstance(key, int):
+        return key % num_reducers
+    if isinstance(key, str):
+        data = key.encode("utf-8")
+    else:
+        data = repr(key).encode("utf-8")
+    return zlib.crc32(data) % num_reducers
+
+
+class SerialExecutor:
+    workers = 1
+
+    def map(self, fn, args_list):
+        return [fn(*args) for args in args_list]
+
+
+class _PoolExecutor:
+    pool_cls = None
+
+    def __init__(self, workers=None):
+        self.workers = workers or cpu_count() or 1
+
+    def map(self, fn, args_list):
+        # ограничиваем число задач в полёте, чтобы ленивый args_list
+        # (например, чанки потокового входа) не материализовался целиком
+        results = []
+        in_flight = deque()
+        with self.pool_cls(max_workers=self.workers) as pool:
+            for args in args_list:
+                in_flight.append(pool.submit(fn, *args))
+                if len(in_flight) >= self.workers * IN_FLIGHT_PER_WORKER:
+                    results.append(in_flight.popleft().result())
+            while in_flight:
+                results.append(in_flight.popleft().result())
+        return results
+
+
+class ThreadExecutor(_PoolExecutor):
+    """Пул потоков: выигрыш есть, когда mapper/reducer отпускают GIL (numpy)."""
+    pool_cls = ThreadPoolExecutor
+
+
+class ProcessExecutor(_PoolExecutor):
+    """Пул процессов: mapper/reducer/combiner должны быть функциями уровня модуля."""
+    pool_cls = ProcessPoolExecutor
+
+
+EXECUTORS = {
+    "serial": SerialExecutor,
+    "thread": ThreadExecutor,
+    "process": ProcessExecutor,
+}
+
+
+def make_executor(executor, workers=None):
+    if not isinstance(executor, str):
+        return executor
+    if executor not in EXECUTORS:
+        raise ValueError(f"Неизвестный исполнитель {executor!r}, ожидается один из {list(EXECUTORS)}")
+    if executor == "serial":
+        return SerialExecutor()
+    return EXECUTORS[executor](workers)
+
+
+# =========================
+#  Входной формат: текстовый файл, разрезанный по строкам
+# =========================
+
+def file_splits(path, n_splits):
+    """
+    Делит файл на n_splits диапазонов байт [start, end), выровненных по
+    границам строк: каждая граница сдвигается на начало следующей строки.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+
+    n_splits = max(1, n_splits)
+    boundaries = [0]
+
+    with open(path, "rb") as f:
+        for i in range(1, n_splits):
+            target = size * i // n_splits
+            if target <= boundaries[-1]:
+                continue
+            f.seek(target - 1)
+            f.readline()
+            pos = f.tell()
+            if pos >= size:
+                break
+            if pos > boundaries[-1]:
+                boundaries.append(pos)
+
+    boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def read_split_lines(path, start, end, encoding="utf-8"):
+    """Строки файла из диапазона [start, end), полученного из file_splits."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        pos = start
+        while pos < end:
+            raw = f.readline()
+            if not raw:
+                break
+            pos += len(raw)
+            yield raw.decode(encoding)
+
+
+def chunk(items, n_chunks):
+    n_chunks = max(1, min(n_chunks, len(items)))
+    size, extra = divmod(len(items), n_chunks)
+    chunks = []
+    start = 0
+    for i in range(n_chunks):
+        end = start + size + (1 if i < extra else 0)
+        chunks.append(items[start:end])
+        start = end
+    return chunks
+
+
+def map_task(records, mapper, combiner, partitioner, num_reducers):
+    """
+    Одна map-задача: mapper по записям, раскладка по партициям,
+    затем combiner по каждому ключу внутри задачи.
+    """
+    partitions = [defaultdict(list) for _ in range(num_reducers)]
+    n_in = 0
+    n_out = 0
+
+    for record in records:
+        n_in += 1
+        for key, value in mapper(record):
+            partitions[partitioner(key, num_reducers)][key].append(value)
+            n_out += 1
+
+    if combiner is not None:
+        for p, groups in enumerate(partitions):
+            combined = defaultdict(list)
+            for key, values in groups.items():
+                combined[key].extend(combiner(key, values))
+            partitions[p] = combined
+
+    n_combined = sum(len(values) for groups in partitions for values in groups.values())
+    return [dict(groups) for groups in partitions], n_in, n_out, n_combined
+
+
+def reduce_task(groups, reducer):
+    outputs = []
+    for key, values in groups.items():
+        outputs.extend(reducer(key, values))
+    return outputs
+
+
+# =========================
+#  Внешний shuffle со сбросом на диск
+# =========================
+
+def _dump_records(path, records):
+    n = 0
+    with open(path, "wb") as f:
+        for record in records:
+            pickle.dump(record, f, protocol=pickle.HIGHEST_PROTOCOL)
+            n += 1
+    return n
+
+
+def _load_records(path):
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+class SpilledOutput:
+    """
+    Выход задачи, лежащий на диске: итерируется без загрузки в память.
+    Файлы удаляются вместе с объектом.
+    """
+
+    def __init__(self, paths, n_records, tmp_dir):
+        self.paths = paths
+        self.n_records = n_records
+        self._cleanup = weakref.finalize(self, shutil.rmtree, tmp_dir, True)
+
+    def __len__(self):
+        return self.n_records
+
+    def __iter__(self):
+        for path in self.paths:
+            yield from _load_records(path)
+
+    def close(self):
+        self._cleanup()
+
+
+def spill_map_task(task_id, records, mapper, combiner, partitioner, num_reducers,
+                   spill_threshold, spill_dir):
+    """
+    map-задача внешнего shuffle: буфер до spill_threshold записей,
+    при переполнении — combiner, сортировка по ключу и сброс прогона
+    (key, values) для каждой партиции в отдельный файл.
+    """
+    buffers = [defaultdict(list) for _ in range(num_reducers)]
+    runs = [[] for _ in range(num_reducers)]
+    stats = {"input": 0, "output": 0, "combined": 0, "spills": 0, "spill_bytes": 0}
+    buffered = 0
+
+    def flush():
+        for p, groups in enumerate(buffers):
+            if not groups:
+                continue
+            items = groups.items()
+            if combiner is not None:
+                items = [(key, list(combiner(key, values))) for key, values in items]
+            items = sorted(items, key=itemgetter(0))
+
+            path = os.path.join(spill_dir, f"map{task_id}-p{p}-{len(runs[p])}.run")
+            _dump_records(path, items)
+            runs[p].append(path)
+
+            stats["combined"] += sum(len(values) for _, values in items)
+            stats["spills"] += 1
+            stats["spill_bytes"] += os.path.getsize(path)
+            buffers[p] = defaultdict(list)
+
+    for record in records:
+        stats["input"] += 1
+        for key, value in mapper(record):
+            buffers[partitioner(key, num_reducers)][key].append(value)
+            stats["output"] += 1
+            buffered += 1
+            if buffered >= spill_threshold:
+                flush()
+                buffered = 0
+
+    if buffered:
+        flush()
+
+    return runs, stats
+
+
+def _merged_runs(run_paths):
+    return heapq.merge(*(_load_records(path) for path in run_paths), key=itemgetter(0))
+
+
+def reduce_runs(run_paths, fan_in=None):
+    """
+    Сливает прогоны группами по fan_in (по умолчанию MERGE_FAN_IN; в тот же
+    каталог), пока их не станет не больше fan_in. Значения одинаковых ключей
+    склеиваются, порядок ключей сохраняется, исходные прогоны удаляются.
+    """
+    if fan_in is None:
+        fan_in = MERGE_FAN_IN
+    level = 0
+    while len(run_paths) > fan_in:
+        next_paths = []
+        for i in range(0, len(run_paths), fan_in):
+            group = run_paths[i:i + fan_in]
+            path = f"{group[0]}.m{level}"
+
+            def merged_groups():
+                for key, chunks in groupby(_merged_runs(group), key=itemgetter(0)):
+                    yield key, [value for _, values in chunks for value in values]
+
+            _dump_records(path, merged_groups())
+            for old in group:
+                os.remove(old)
+            next_paths.append(path)
+        run_paths = next_paths
+        level += 1
+    return run_paths
+
+
+def spill_reduce_task(partition, run_paths, reducer, out_dir, fan_in=None):
+    """
+    reduce-задача внешнего shuffle: k-way слияние отсортированных прогонов
+    (многопроходное, если прогонов больше fan_in), reducer по каждой группе
+    одинаковых ключей, выход — в файл.
+    """
+    merged = _merged_runs(reduce_runs(list(run_paths), fan_in))
+
+    def outputs():
+        for key, group in groupby(merged, key=itemgetter(0)):
+            values = [value for _, chunk_values in group for value in chunk_values]
+            stats["groups"] += 1
+            yield from reducer(key, values)
+
+    stats = {"groups": 0}
+    out_path = os.path.join(out_dir, f"reduce-p{partition}.out")
+    n_out = _dump_records(out_path, outputs())
+    return out_path, n_out, stats["groups"]
+
+
+def _batches(records, size):
+    it = iter(records)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _run_spilling(inputs, mapper, reducer, combiner, partitioner, executor,
+                  num_reducers, spill_threshold, spill_dir, spill_task_records, stats):
+    work_dir = tempfile.mkdtemp(prefix="mr-spill-", dir=spill_dir)
+    out_dir = tempfile.mkdtemp(prefix="mr-out-", dir=spill_dir)
+
+    try:
+        t0 = time.perf_counter()
+        tasks = (
+            (task_id, batch, mapper, combiner, partitioner, num_reducers, spill_threshold, work_dir)
+            for task_id, batch in enumerate(_batches(inputs, spill_task_records))
+        )
+        map_results = executor.map(spill_map_task, tasks)
+        stats["map_s"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        runs = [[] for _ in range(num_reducers)]
+        for task_runs, task_stats in map_results:
+            stats["input_records"] += task_stats["input"]
+            stats["map_output_records"] += task_stats["output"]
+            stats["combine_output_records"] += task_stats["combined"]
+            stats["spills"] += task_stats["spills"]
+            stats["spill_bytes"] += task_stats["spill_bytes"]
+            for p, paths in enumerate(task_runs):
+                runs[p].extend(paths)
+        stats["map_tasks"] = len(map_results)
+        stats["shuffle_s"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        reduce_args = [(p, paths, reducer, out_dir) for p, paths in enumerate(runs) if paths]
+        reduce_results = executor.map(spill_reduce_task, reduce_args)
+        stats["reduce_s"] = time.perf_counter() - t0
+    except BaseException:
+        shutil.rmtree(out_dir, ignore_errors=True)
+        raise
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    stats["reduce_tasks"] = len(reduce_results)
+    stats["reduce_groups"] = sum(n_groups for _, _, n_groups in reduce_results)
+    stats["output_records"] = sum(n_out for _, n_out, _ in reduce_results)
+
+    return SpilledOutput([path for path, _, _ in reduce_results], stats["output_records"], out_dir)
+
+
+def new_counters():
+    return {
+        "map_tasks": 0,
+        "reduce_tasks": 0,
+        "input_records": 0,
+        "map_output_records": 0,
+        "combine_output_records": 0,
+        "reduce_groups": 0,
+        "output_records": 0,
+        "map_s": 0.0,
+        "shuffle_s": 0.0,
+        "reduce_s": 0.0,
+        "spills": 0,
+        "spill_bytes": 0,
+    }
+
+
+def run(inputs, mapper, reducer, combiner=None, partitioner=None, executor="serial",
+        num_reducers=None, num_map_tasks=None, workers=None, counters=None,
+        spill_threshold=None, spill_dir=None, map_task_records=MAP_TASK_RECORDS,
+        spill_task_records=None):
+    """
+    Запускает задачу и возвращает список выходных записей reducer'а
+    (или SpilledOutput, если задан spill_threshold).
+    spill_task_records — входных записей на map-задачу во внешнем shuffle
+    (по умолчанию SPILL_TASK_RECORDS).
+    Если передан словарь counters, в него пишутся счётчики и время стадий.
+    """
+    executor = make_executor(executor, workers)
+    n_workers = getattr(executor, "workers", 1)
+
+    if partitioner is None:
+        partitioner = hash_partitioner
+    if num_reducers is None:
+        num_reducers = n_workers
+    if num_map_tasks is None:
+        num_map_tasks = 1 if n_workers == 1 else n_workers * MAP_TASKS_PER_WORKER
+
+    stats = new_counters()
+
+    if spill_threshold is not None:
+        if spill_task_records is None:
+            spill_task_records = SPILL_TASK_RECORDS
+        outputs = _run_spilling(inputs, mapper, reducer, combiner, partitioner, executor,
+                                num_reducers, spill_threshold, spill_dir, spill_task_records,
+                                stats)
+        if counters is not None:
+            counters.update(stats)
+        return outputs
+
+    t0 = time.perf_counter()
+    if hasattr(inputs, "__len__"):
+        records = list(inputs)
+        tasks = chunk(records, num_map_tasks) if records else []
+    elif num_map_tasks == 1:
+        tasks = [inputs]
+    else:
+        tasks = _batches(inputs, map_task_records)
+    map_results = executor.map(
+        map_task,
+        ((task, mapper, combiner, partitioner, num_reducers) for task in tasks),
+    )
+    stats["map_s"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    shuffled = [defaultdict(list) for _ in range(num_reducers)]
+    for partitions, n_in, n_out, n_combined in map_results:
+        stats["input_records"] += n_in
+        stats["map_output_records"] += n_out
+        stats["combine_output_records"] += n_combined
+        for p, groups in enumerate(partitions):
+            target = shuffled[p]
+            for key, values in groups.items():
+                target[key].extend(values)
+    stats["shuffle_s"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    non_empty = [groups for groups in shuffled if groups]
+    reduce_results = executor.map(reduce_task, [(groups, reducer) for groups in non_empty])
+    outputs = [out for result in reduce_results for out in result]
+    stats["reduce_s"] = time.perf_counter() - t0
+
+    stats["map_tasks"] = len(map_results)
+    stats["reduce_tasks"] = len(non_empty)
+    stats["reduce_groups"] = sum(len(groups) for groups in shuffled)
+    stats["output_records"] = len(outputs)
+
+    if counters is not None:
+        counters.update(stats)
+
+    return outputs